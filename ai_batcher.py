@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class AIBatcher:
+    """
+    Collects AI classification requests that arrive within a short window
+    and sends them as one batched request, then fans the per-message
+    verdicts back out to the waiting callers.
+    
+    A batch is flushed as soon as it holds max_batch_size items or when
+    max_wait_seconds have passed since its first item arrived.
+    """
+    
+    def __init__(self, classify_batch: Callable[[List[str]], Awaitable[List[Any]]],
+                 max_batch_size: int = 8, max_wait_seconds: float = 0.025):
+        self.classify_batch = classify_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer = None
+        self._tasks = set()
+        self.batches_sent = 0
+        self.items_sent = 0
+    
+    async def submit(self, content: str) -> Dict[str, Any]:
+        """Queue one message for the next batch and wait for its verdict"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((content, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything pending as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches_sent += 1
+        self.items_sent += len(batch)
+        try:
+            verdicts = await self.classify_batch([content for content, _ in batch])
+            if len(verdicts) != len(batch):
+                raise ValueError(f"Expected {len(batch)} verdicts, got {len(verdicts)}")
+        except Exception as e:
+            logger.warning(f"Batched AI request of {len(batch)} messages failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # A verdict slot may hold an exception for a message the response skipped
+        for (_, future), verdict in zip(batch, verdicts):
+            if future.done():
+                continue
+            if isinstance(verdict, Exception):
+                future.set_exception(verdict)
+            else:
+                future.set_result(verdict)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batches_sent": self.batches_sent,
+            "items_sent": self.items_sent,
+            "average_batch_size": round(self.items_sent / self.batches_sent, 2) if self.batches_sent else 0.0,
+            "pending": len(self._pending)
+        }
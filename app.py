@@ -30,4 +30,7 @@ db = SQLAlchemy(app, model_class=Base)
 with app.app_context():
     import models  # noqa: F401
     db.create_all()
+    # create_all() skips tables that already exist, so add any new indexes
+    for index in models.ViolationLog.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
     logging.info("Database tables created")
\ No newline at end of file
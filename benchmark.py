@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmark for the moderation pipeline.
+
+Generates a Vietnamese chat corpus, runs each stage over it and reports
+messages/sec and p50/p95/p99 latency. The AI path runs against the local
+fake OpenAI server with injectable latency. Results can be saved as a
+baseline and later runs compared against it.
+
+Usage:
+    python benchmark.py --messages 5000 --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --tolerance 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+from typing import Any, Callable, Dict, List
+from aiohttp import web
+from config import Config
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = [
+    "hôm", "nay", "trời", "đẹp", "quá", "mọi", "người", "ơi", "ăn", "cơm", "chưa",
+    "mình", "vừa", "xem", "phim", "hay", "lắm", "game", "này", "vui", "thật", "sự",
+    "công", "việc", "bận", "rộn", "cuối", "tuần", "nhé", "được", "không", "bạn",
+    "ở", "đâu", "thế", "nào", "cảm", "ơn", "nhiều", "server", "update", "mới",
+]
+SPAM_TEMPLATES = [
+    "nooooooooo {text}",
+    "{text} 😀😀😀😀😀😀😀😀😀😀😀😀",
+    "<@1> <@2> <@3> <@4> <@5> <@6> {text}",
+    "{upper}",
+]
+INVITE_TEMPLATES = [
+    "vào server mình chơi nè discord.gg/{code}",
+    "https://discord.com/invite/{code} {text}",
+]
+
+def generate_corpus(count: int, seed: int = 42, keyword_density: float = 0.15,
+                    invite_ratio: float = 0.02, spam_ratio: float = 0.05) -> List[str]:
+    """
+    Build a reproducible chat corpus. keyword_density is the share of words
+    replaced by filter keywords; invite and spam ratios are shares of messages.
+    """
+    rng = random.Random(seed)
+    keywords = Config.get_all_bad_words()
+    corpus = []
+    for _ in range(count):
+        # Mostly short chat lines with a long tail of long messages
+        length = min(int(rng.expovariate(1 / 8)) + 1, 120)
+        words = [rng.choice(keywords) if rng.random() < keyword_density else rng.choice(FILLER_WORDS)
+                 for _ in range(length)]
+        text = " ".join(words)
+
+        roll = rng.random()
+        if roll < invite_ratio:
+            code = "".join(rng.choice("abcdefghijkmnpqrstuvwxyz0123456789") for _ in range(8))
+            text = rng.choice(INVITE_TEMPLATES).format(code=code, text=text)
+        elif roll < invite_ratio + spam_ratio:
+            text = rng.choice(SPAM_TEMPLATES).format(text=text, upper=text.upper())
+        corpus.append(text)
+    return corpus
+
+def summarize(latencies: List[float], wall_seconds: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (ms) for one stage"""
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "msgs_per_sec": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def run_sync_stage(func: Callable[[str], Any], items: List[Any]) -> Dict[str, float]:
+    latencies = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for item in items:
+        begin = perf_counter()
+        func(item)
+        latencies.append(perf_counter() - begin)
+    return summarize(latencies, perf_counter() - started)
+
+async def run_async_stage(func: Callable[[str], Any], items: List[Any], concurrency: int) -> Dict[str, float]:
+    """Drive an async stage with a fixed number of concurrent callers"""
+    latencies = []
+    iterator = iter(items)
+
+    async def caller():
+        for item in iterator:
+            begin = time.perf_counter()
+            await func(item)
+            latencies.append(time.perf_counter() - begin)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+async def start_fake_server(latency_ms: float):
+    from fake_openai_server import create_app
+    runner = web.AppRunner(create_app(latency_ms))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+def benchmark_moderation(corpus: List[str]) -> Dict[str, Dict[str, float]]:
+    from message_scanner import scan_message
+    from moderation import ModerationService
+
+    Config.OPENAI_API_KEY = None
+    service = ModerationService()
+    results = {}
+
+    scan_message.cache_clear()
+    results["scan_message"] = run_sync_stage(scan_message.__wrapped__, corpus)
+    scan_message.cache_clear()
+    results["has_discord_invite"] = run_sync_stage(service.has_discord_invite, corpus)
+    results["check_with_keywords"] = run_sync_stage(service.check_with_keywords, corpus)
+
+    async def local(content):
+        return await service.check_message(content, use_ai=False)
+
+    results["check_message_local"] = asyncio.run(run_async_stage(local, corpus, 1))
+
+    async def bulk():
+        # Latency here is the gap between consecutive results, chunking included
+        latencies = []
+        started = last = time.perf_counter()
+        async for _ in service.check_messages(corpus, use_ai=False):
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+        return summarize(latencies, last - started)
+
+    results["check_messages_local"] = asyncio.run(bulk())
+    return results
+
+async def benchmark_ai(corpus: List[str], latency_ms: float, concurrency: int) -> Dict[str, Dict[str, float]]:
+    from moderation import ModerationService
+
+    runner, base_url = await start_fake_server(latency_ms)
+    Config.OPENAI_API_KEY = "benchmark"
+    Config.OPENAI_BASE_URL = base_url
+    results = {}
+    try:
+        service = ModerationService()
+        results["check_with_ai"] = await run_async_stage(service.check_with_ai, corpus, concurrency)
+        await service.close()
+
+        # Fresh service so the end-to-end run starts with a cold verdict cache
+        service = ModerationService()
+        results["check_message_ai"] = await run_async_stage(service.check_message, corpus, concurrency)
+        results["check_message_ai"]["stages"] = dict(service.stage_counts)
+        await service.close()
+    finally:
+        await runner.cleanup()
+    return results
+
+def benchmark_databases(corpus: List[str], operations: int) -> Dict[str, Dict[str, float]]:
+    from database import ViolationDatabase
+    from sqlite_database import SQLiteViolationDatabase
+
+    rng = random.Random(7)
+    rows = [
+        (rng.randrange(5000), "user", rng.choice(["Ngôn từ thô tục", "Spam", "Nội dung xúc phạm"]),
+         corpus[i % len(corpus)], rng.randrange(50), rng.randrange(20))
+        for i in range(operations)
+    ]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.DATABASE_FILE = os.path.join(tmp, "violations.json")
+        Config.VIOLATION_LOG_DIR = os.path.join(tmp, "violation_log")
+        engines = {
+            "jsonl": ViolationDatabase(),
+            "sqlite": SQLiteViolationDatabase(os.path.join(tmp, "violations.db")),
+        }
+        for name, db in engines.items():
+            results[f"db_{name}_add"] = run_sync_stage(lambda row: db.add_violation(*row), rows)
+            results[f"db_{name}_user_violations"] = run_sync_stage(
+                lambda row: db.get_user_violations(row[0], row[5]), rows[:1000])
+            results[f"db_{name}_stats"] = run_sync_stage(
+                lambda row: db.get_violation_stats(row[5], days=7), rows[:200])
+            if hasattr(db, "close"):
+                db.close()
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Stages whose throughput dropped or p95 grew by more than tolerance"""
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if not previous:
+            continue
+        if current["msgs_per_sec"] < previous["msgs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{stage}: {current['msgs_per_sec']:.0f} msgs/s (baseline {previous['msgs_per_sec']:.0f})")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {current['p95_ms']:.3f} ms (baseline {previous['p95_ms']:.3f})")
+    return regressions
+
+def print_report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    print(f"{'stage':<28}{'msgs/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vs base':>10}")
+    for stage, stats in results.items():
+        change = ""
+        if stage in baseline and baseline[stage]["msgs_per_sec"]:
+            change = f"{stats['msgs_per_sec'] / baseline[stage]['msgs_per_sec'] - 1:+.0%}"
+        print(f"{stage:<28}{stats['msgs_per_sec']:>12.0f}{stats['p50_ms']:>10.3f}"
+              f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{change:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the moderation pipeline")
+    parser.add_argument("--messages", type=int, default=5000, help="Corpus size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keyword-density", type=float, default=0.15)
+    parser.add_argument("--invite-ratio", type=float, default=0.02)
+    parser.add_argument("--spam-ratio", type=float, default=0.05)
+    parser.add_argument("--ai-latency-ms", type=float, default=200.0, help="Fake OpenAI server latency")
+    parser.add_argument("--ai-concurrency", type=int, default=64, help="Concurrent callers on the AI path")
+    parser.add_argument("--db-operations", type=int, default=5000)
+    parser.add_argument("--skip-ai", action="store_true")
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--save-baseline", help="Write results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    corpus = generate_corpus(args.messages, args.seed, args.keyword_density, args.invite_ratio, args.spam_ratio)
+
+    results = benchmark_moderation(corpus)
+    if not args.skip_ai:
+        results.update(asyncio.run(benchmark_ai(corpus, args.ai_latency_ms, args.ai_concurrency)))
+    if not args.skip_db:
+        results.update(benchmark_databases(corpus, args.db_operations))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "args": vars(args),
+                },
+                "stages": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
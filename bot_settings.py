@@ -0,0 +1,26 @@
+from typing import Dict, NamedTuple
+from config import Config
+from utils import safe_int_convert
+
+# BotSettings row bumped on every save so readers can tell when to reload
+SETTINGS_VERSION_KEY = "settings_version"
+
+class RuntimeSettings(NamedTuple):
+    """Typed snapshot of the settings managed from the dashboard"""
+    mute_duration: int = Config.MUTE_DURATION_MINUTES
+    invite_mute_duration: int = Config.INVITE_MUTE_DURATION_MINUTES
+    ai_moderation: bool = True
+    version: int = 0
+    
+    @classmethod
+    def from_raw(cls, raw: Dict[str, str]) -> "RuntimeSettings":
+        """Parse BotSettings string values, falling back to defaults"""
+        defaults = cls()
+        mute_duration = safe_int_convert(raw.get("mute_duration"), defaults.mute_duration)
+        invite_mute_duration = safe_int_convert(raw.get("invite_mute_duration"), defaults.invite_mute_duration)
+        return cls(
+            mute_duration=mute_duration if mute_duration > 0 else defaults.mute_duration,
+            invite_mute_duration=invite_mute_duration if invite_mute_duration > 0 else defaults.invite_mute_duration,
+            ai_moderation=raw.get("ai_moderation", "true") == "true",
+            version=safe_int_convert(raw.get(SETTINGS_VERSION_KEY), 0)
+        )
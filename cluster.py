@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Cluster launcher: runs the moderation bot as N sharded worker processes.
+
+Each worker is `main.py` with SHARD_COUNT, SHARD_IDS and CLUSTER_ID set, so
+it runs an AutoShardedBot over its own shard range. The supervisor restarts
+crashed workers with exponential backoff, and every worker writes a status
+file that `python cluster.py status` aggregates into one health view.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import subprocess
+import urllib.request
+from typing import Any, Dict, List, Optional
+from config import Config
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# A worker that stayed up this long is considered healthy again
+STABLE_RUN_SECONDS = 60
+DISCORD_GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+def recommended_shard_count(token: str) -> int:
+    """Ask Discord for the recommended shard count for this bot"""
+    request = urllib.request.Request(
+        DISCORD_GATEWAY_URL,
+        headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (moderation-cluster, 1.0)"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return int(json.load(response)["shards"])
+
+def plan_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Split shard ids into contiguous ranges, one per worker"""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for index in range(workers):
+        size = base + (1 if index < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+def status_path(status_dir: str, name: str) -> str:
+    return os.path.join(status_dir, f"{name}.json")
+
+def write_worker_status(status_dir: str, name: str, status: Dict[str, Any]):
+    """Atomically replace a worker's status file"""
+    os.makedirs(status_dir, exist_ok=True)
+    path = status_path(status_dir, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def read_cluster_health(status_dir: str, stale_after: float) -> Dict[str, Any]:
+    """Aggregate every worker status file into a cluster health summary"""
+    workers = []
+    if os.path.isdir(status_dir):
+        for filename in sorted(os.listdir(status_dir)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(status_dir, filename), "r", encoding="utf-8") as f:
+                    workers.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unreadable status file {filename}: {e}")
+
+    now = time.time()
+    for worker in workers:
+        worker["stale"] = now - worker.get("updated_at", 0) > stale_after
+        worker["healthy"] = worker.get("ready", False) and not worker["stale"]
+
+    bots = [worker for worker in workers if worker.get("role") == "bot"]
+    supervisors = [worker for worker in workers if worker.get("role") == "supervisor"]
+    return {
+        "workers": workers,
+        "healthy": bool(workers) and all(worker["healthy"] for worker in workers),
+        "shards": sum(len(worker.get("shard_ids") or []) for worker in bots),
+        "guilds": sum(worker.get("guilds", 0) for worker in bots),
+        "queue_depth": sum(worker.get("queue_depth", 0) for worker in bots),
+        "restarts": sum(process["restarts"] for worker in supervisors for process in worker.get("processes", [])),
+    }
+
+class ManagedProcess:
+    """A supervised child process with its restart bookkeeping"""
+
+    def __init__(self, name: str, argv: List[str], env: Dict[str, str]):
+        self.name = name
+        self.argv = argv
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_delay = 1.0
+        self.restart_at: Optional[float] = None
+
+class ClusterSupervisor:
+    """Start, watch and restart a set of worker processes"""
+
+    def __init__(self, processes: List[ManagedProcess], max_restart_delay: float = 300.0,
+                 status_dir: Optional[str] = None, status_interval: float = 15.0):
+        self.processes = processes
+        self.max_restart_delay = max_restart_delay
+        self.status_dir = status_dir
+        self.status_interval = status_interval
+        self._last_status = 0.0
+        self._stopping = False
+
+    def _spawn(self, managed: ManagedProcess):
+        env = dict(os.environ, **managed.env)
+        managed.process = subprocess.Popen(managed.argv, env=env)
+        managed.started_at = time.monotonic()
+        managed.restart_at = None
+        logger.info(f"Started {managed.name} (pid {managed.process.pid})")
+
+    def _check(self, managed: ManagedProcess):
+        now = time.monotonic()
+        if managed.restart_at is not None:
+            if now >= managed.restart_at:
+                managed.restarts += 1
+                self._spawn(managed)
+            return
+
+        exit_code = managed.process.poll()
+        if exit_code is None:
+            return
+
+        # Reset the backoff for workers that ran long enough before failing
+        if now - managed.started_at >= STABLE_RUN_SECONDS:
+            managed.restart_delay = 1.0
+        logger.error(f"{managed.name} exited with code {exit_code}, restarting in {managed.restart_delay:.0f}s")
+        managed.restart_at = now + managed.restart_delay
+        managed.restart_delay = min(managed.restart_delay * 2, self.max_restart_delay)
+
+    def _write_status(self):
+        now = time.monotonic()
+        if not self.status_dir or now - self._last_status < self.status_interval:
+            return
+        self._last_status = now
+        write_worker_status(self.status_dir, "supervisor", {
+            "name": "supervisor",
+            "role": "supervisor",
+            "pid": os.getpid(),
+            "ready": True,
+            "updated_at": time.time(),
+            "processes": [
+                {
+                    "name": managed.name,
+                    "pid": managed.process.pid if managed.process else None,
+                    "running": managed.restart_at is None and managed.process.poll() is None,
+                    "restarts": managed.restarts,
+                }
+                for managed in self.processes
+            ],
+        })
+
+    def run(self):
+        """Supervise until SIGINT/SIGTERM"""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        self._clear_status()
+        for managed in self.processes:
+            self._spawn(managed)
+        try:
+            while not self._stopping:
+                for managed in self.processes:
+                    self._check(managed)
+                self._write_status()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def _clear_status(self):
+        """Remove status files left by a previous run so they do not read as stale workers"""
+        if not self.status_dir or not os.path.isdir(self.status_dir):
+            return
+        for filename in os.listdir(self.status_dir):
+            if filename.endswith(".json") or filename.endswith(".json.tmp"):
+                try:
+                    os.remove(os.path.join(self.status_dir, filename))
+                except OSError as e:
+                    logger.warning(f"Could not remove stale status file {filename}: {e}")
+
+    def stop(self):
+        self._stopping = True
+
+    def shutdown(self, timeout: float = 30.0):
+        """Interrupt every worker, killing any that do not exit in time"""
+        running = [m for m in self.processes if m.process and m.process.poll() is None]
+        # SIGINT lets the bot flush its queues the same way Ctrl+C does
+        for managed in running:
+            managed.process.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + timeout
+        for managed in running:
+            try:
+                managed.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{managed.name} did not stop in time, killing it")
+                managed.process.kill()
+        logger.info("Cluster stopped")
+
+def build_bot_workers(shard_count: int, workers: int) -> List[ManagedProcess]:
+    """One main.py process per shard range"""
+    # The JSONL store has a single writer; clustered workers must share SQLite.
+    # Never switch silently: the existing history has to be migrated first.
+    engine = (os.getenv("DATABASE_ENGINE") or "").lower()
+    if len(plan_shards(shard_count, workers)) > 1 and engine != "sqlite":
+        raise SystemExit(
+            "Multiple workers need a shared violation store. Migrate the existing history with "
+            "`python sqlite_database.py --source jsonl` (and `--source json` for a legacy violations.json), "
+            "then set DATABASE_ENGINE=sqlite"
+        )
+
+    processes = []
+    for cluster_id, shard_ids in enumerate(plan_shards(shard_count, workers)):
+        processes.append(ManagedProcess(
+            f"bot-{cluster_id}",
+            [sys.executable, "main.py"],
+            {"CLUSTER_ID": str(cluster_id),
+             "SHARD_COUNT": str(shard_count),
+             "SHARD_IDS": ",".join(str(shard) for shard in shard_ids)}
+        ))
+    return processes
+
+def resolve_shard_count(shard_count: Optional[int]) -> int:
+    if shard_count:
+        return shard_count
+    token = os.getenv("DISCORD_BOT_TOKEN")
+    if not token:
+        raise SystemExit("DISCORD_BOT_TOKEN is required to look up the recommended shard count")
+    return recommended_shard_count(token)
+
+def print_status(status_dir: str):
+    health = read_cluster_health(status_dir, Config.CLUSTER_STATUS_INTERVAL_SECONDS * 3)
+    state = "healthy" if health["healthy"] else "DEGRADED"
+    print(f"Cluster {state}: {len(health['workers'])} workers, {health['shards']} shards, "
+          f"{health['guilds']} guilds, queue depth {health['queue_depth']}, {health['restarts']} restarts")
+    for worker in health["workers"]:
+        if worker.get("role") == "supervisor":
+            for process in worker.get("processes", []):
+                state = "running" if process["running"] else "restarting"
+                print(f"  [supervisor] {process['name']}: {state}, pid {process['pid']}, {process['restarts']} restarts")
+            continue
+        flag = "ok" if worker["healthy"] else ("stale" if worker["stale"] else "starting")
+        shards = worker.get("shard_ids")
+        print(f"  {worker.get('name')}: {flag}, pid {worker.get('pid')}, shards {shards}, "
+              f"guilds {worker.get('guilds', 0)}, latency {worker.get('latency_ms', 0):.0f} ms, "
+              f"queue {worker.get('queue_depth', 0)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the moderation bot as a sharded cluster")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    parser.add_argument("--workers", type=int, default=Config.CLUSTER_WORKERS, help="Number of bot processes")
+    parser.add_argument("--shards", type=int, default=Config.SHARD_COUNT, help="Total shard count (default: Discord's recommendation)")
+    parser.add_argument("--status-dir", default=Config.CLUSTER_STATUS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status(args.status_dir)
+        return
+
+    setup_logging()
+    shard_count = resolve_shard_count(args.shards)
+    processes = build_bot_workers(shard_count, args.workers)
+    logger.info(f"Running {shard_count} shards across {len(processes)} workers")
+    ClusterSupervisor(
+        processes,
+        max_restart_delay=Config.CLUSTER_MAX_RESTART_DELAY_SECONDS,
+        status_dir=args.status_dir,
+        status_interval=Config.CLUSTER_STATUS_INTERVAL_SECONDS
+    ).run()
+
+if __name__ == "__main__":
+    main()
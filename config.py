@@ -9,11 +9,71 @@ class Config:
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # Override to point the bot at a local fake completions server
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+    # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+    # do not change this unless explicitly requested by the user
+    OPENAI_MODEL = "gpt-4o"
+    
+    # AI client tuning
+    AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+    AI_REQUEST_TIMEOUT_SECONDS = float(os.getenv("AI_REQUEST_TIMEOUT_SECONDS", "10"))
+    AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "1"))
+    
+    # Micro-batching of concurrent AI requests (batch size 1 disables it)
+    AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "8"))
+    AI_BATCH_MAX_WAIT_MS = float(os.getenv("AI_BATCH_MAX_WAIT_MS", "25"))
+    
+    # AI verdict cache
+    AI_CACHE_MAX_SIZE = int(os.getenv("AI_CACHE_MAX_SIZE", "10000"))
+    AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "3600"))
     
     # Moderation Settings
     MUTE_DURATION_MINUTES = 10
     INVITE_MUTE_DURATION_MINUTES = 5
     
+    # Per-guild moderation queues: above the degrade depths the AI stage is
+    # skipped, and messages beyond a guild's max size are shed
+    MODERATION_WORKERS = int(os.getenv("MODERATION_WORKERS", "8"))
+    GUILD_QUEUE_MAX_SIZE = int(os.getenv("GUILD_QUEUE_MAX_SIZE", "500"))
+    GUILD_QUEUE_DEGRADE_DEPTH = int(os.getenv("GUILD_QUEUE_DEGRADE_DEPTH", "50"))
+    QUEUE_DEGRADE_TOTAL_DEPTH = int(os.getenv("QUEUE_DEGRADE_TOTAL_DEPTH", "1000"))
+    
+    # Flood/raid detection: token bucket rates are per second, bursts are
+    # the number of messages (or mentions) allowed back to back
+    FLOOD_USER_RATE = float(os.getenv("FLOOD_USER_RATE", "1"))
+    FLOOD_USER_BURST = float(os.getenv("FLOOD_USER_BURST", "8"))
+    FLOOD_MENTION_RATE = float(os.getenv("FLOOD_MENTION_RATE", "0.5"))
+    FLOOD_MENTION_BURST = float(os.getenv("FLOOD_MENTION_BURST", "15"))
+    FLOOD_MESSAGE_MENTION_LIMIT = int(os.getenv("FLOOD_MESSAGE_MENTION_LIMIT", "10"))
+    RAID_WINDOW_SECONDS = float(os.getenv("RAID_WINDOW_SECONDS", "30"))
+    RAID_MIN_AUTHORS = int(os.getenv("RAID_MIN_AUTHORS", "4"))
+    RAID_MIN_LENGTH = int(os.getenv("RAID_MIN_LENGTH", "10"))
+    FLOOD_MAX_TRACKED = int(os.getenv("FLOOD_MAX_TRACKED", "500000"))
+    FLOOD_IDLE_SECONDS = float(os.getenv("FLOOD_IDLE_SECONDS", "600"))
+    
+    # Retries per enforcement action (delete, timeout, DM)
+    ENFORCEMENT_MAX_RETRIES = int(os.getenv("ENFORCEMENT_MAX_RETRIES", "3"))
+    
+    # Cascade moderation thresholds: local results at or above the decisive
+    # confidence are final, results below the escalation floor are treated
+    # as clean, and only the band in between is sent to the AI
+    LOCAL_DECISIVE_CONFIDENCE = float(os.getenv("LOCAL_DECISIVE_CONFIDENCE", "0.8"))
+    AI_ESCALATION_MIN_CONFIDENCE = float(os.getenv("AI_ESCALATION_MIN_CONFIDENCE", "0.3"))
+    # A message with no keyword hit is not known to be clean: unless the local
+    # classifier clears it, it is escalated with this confidence. Set it below
+    # AI_ESCALATION_MIN_CONFIDENCE to treat such messages as clean (keyword-only)
+    AI_NO_HIT_CONFIDENCE = float(os.getenv("AI_NO_HIT_CONFIDENCE", "0.5"))
+    HARASSMENT_SINGLE_HIT_CONFIDENCE = 0.4
+    SPAM_SIGNAL_CONFIDENCE = 0.5
+    
+    # Local n-gram classifier (train with local_classifier.py); verdicts at or
+    # above the violation confidence are final, below the clean confidence the
+    # message is treated as clean, anything in between goes to the AI
+    LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", "models/local_classifier.npz")
+    LOCAL_CLASSIFIER_VIOLATION_CONFIDENCE = float(os.getenv("LOCAL_CLASSIFIER_VIOLATION_CONFIDENCE", "0.9"))
+    LOCAL_CLASSIFIER_CLEAN_CONFIDENCE = float(os.getenv("LOCAL_CLASSIFIER_CLEAN_CONFIDENCE", "0.05"))
+    
     # Violation Types
     VIOLATION_TYPES = {
         "PROFANITY": "Ngôn từ thô tục",
@@ -51,9 +111,75 @@ class Config:
         "discordapp.com/invite/"
     ]
     
-    # Database file
+    # Legacy whole-file database, imported into the violation log on first start
     DATABASE_FILE = "violations.json"
     
+    # Violation storage engine: "jsonl" (append-only log) or "sqlite"
+    DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", "jsonl")
+    SQLITE_DATABASE_FILE = os.getenv("SQLITE_DATABASE_FILE", "violations.db")
+    
+    # Append-only violation log
+    VIOLATION_LOG_DIR = os.getenv("VIOLATION_LOG_DIR", "violation_log")
+    VIOLATION_SEGMENT_MAX_BYTES = int(os.getenv("VIOLATION_SEGMENT_MAX_BYTES", str(16 * 1024 * 1024)))
+    VIOLATION_COMPACT_MIN_DEAD = 1000
+    
+    # Dashboard database, mirrored by the bot's write-behind violation log
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    VIOLATION_LOG_BATCH_SIZE = int(os.getenv("VIOLATION_LOG_BATCH_SIZE", "100"))
+    VIOLATION_LOG_FLUSH_SECONDS = float(os.getenv("VIOLATION_LOG_FLUSH_SECONDS", "2"))
+    VIOLATION_LOG_QUEUE_SIZE = int(os.getenv("VIOLATION_LOG_QUEUE_SIZE", "10000"))
+    
+    # Web dashboard API used to sync keywords and settings into the bot
+    DASHBOARD_URL = os.getenv("DASHBOARD_URL")
+    DASHBOARD_SYNC_INTERVAL_SECONDS = float(os.getenv("DASHBOARD_SYNC_INTERVAL_SECONDS", "10"))
+    
+    # Sharding: SHARD_COUNT unset lets discord.py pick the recommended count;
+    # SHARD_IDS (comma separated) limits this process to a subset of shards
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+    SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard.strip()] or None
+    
+    # Cluster supervisor (cluster.py)
+    CLUSTER_ID = os.getenv("CLUSTER_ID")
+    CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", str(os.cpu_count() or 1)))
+    CLUSTER_STATUS_DIR = os.getenv("CLUSTER_STATUS_DIR", "cluster_status")
+    CLUSTER_STATUS_INTERVAL_SECONDS = float(os.getenv("CLUSTER_STATUS_INTERVAL_SECONDS", "15"))
+    CLUSTER_MAX_RESTART_DELAY_SECONDS = float(os.getenv("CLUSTER_MAX_RESTART_DELAY_SECONDS", "300"))
+    
+    # Prometheus metrics endpoint on the bot (0 disables it); clustered
+    # workers listen on METRICS_PORT + CLUSTER_ID
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+    # Where the dashboard reads the bot's metrics from
+    BOT_METRICS_URL = os.getenv("BOT_METRICS_URL", "http://127.0.0.1:9108")
+    
+    # On-demand profiler on the metrics endpoint and /profile; the HTTP
+    # endpoints only exist when a token is set and requests must send it
+    # in X-Debug-Token
+    PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+    PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    
+    # Retroactive rescan when dashboard keywords change: recent messages kept
+    # in memory per worker (0 disables) plus violation_logs rows from the
+    # lookback period, scanned in chunks; background jobs (rescan, retention)
+    # pause while the moderation queues hold more than RESCAN_PAUSE_QUEUE_DEPTH
+    RESCAN_WINDOW_SIZE = int(os.getenv("RESCAN_WINDOW_SIZE", "5000"))
+    RESCAN_LOOKBACK_DAYS = int(os.getenv("RESCAN_LOOKBACK_DAYS", "30"))
+    RESCAN_CHUNK_SIZE = int(os.getenv("RESCAN_CHUNK_SIZE", "500"))
+    RESCAN_THROTTLE_SECONDS = float(os.getenv("RESCAN_THROTTLE_SECONDS", "0.1"))
+    RESCAN_PAUSE_QUEUE_DEPTH = int(os.getenv("RESCAN_PAUSE_QUEUE_DEPTH", "50"))
+    RESCAN_STATE_DIR = os.getenv("RESCAN_STATE_DIR", "rescan")
+    
+    # Violation history retention (opt-in): records older than RETENTION_DAYS
+    # are moved into monthly gzip archives under ARCHIVE_DIR; the default 0
+    # keeps everything. RETENTION_DAYS_BY_GUILD overrides it per guild,
+    # e.g. "123:365,456:0"
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+    RETENTION_DAYS_BY_GUILD = os.getenv("RETENTION_DAYS_BY_GUILD", "")
+    RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "6"))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+    RETENTION_PAUSE_SECONDS = float(os.getenv("RETENTION_PAUSE_SECONDS", "0.2"))
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+    
     # Logging configuration
     LOG_LEVEL = "INFO"
     LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -0,0 +1,50 @@
+import logging
+import aiohttp
+from typing import Dict, Any, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class DashboardClient:
+    """
+    Polls the web dashboard's JSON API.
+    
+    Every endpoint remembers the ETag of its last response and sends it back
+    as If-None-Match, so an unchanged resource costs a bodiless 304.
+    """
+    
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._etags: Dict[str, str] = {}
+    
+    @classmethod
+    def from_config(cls) -> Optional["DashboardClient"]:
+        if not Config.DASHBOARD_URL:
+            logger.info("DASHBOARD_URL not set, dashboard keywords and settings will not be synced")
+            return None
+        return cls(Config.DASHBOARD_URL)
+    
+    async def fetch(self, path: str) -> Optional[Dict[str, Any]]:
+        """GET a dashboard endpoint; returns None if it has not changed"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        
+        headers = {}
+        if path in self._etags:
+            headers["If-None-Match"] = self._etags[path]
+        
+        async with self._session.get(f"{self.base_url}{path}", headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            data = await response.json()
+            if response.headers.get("ETag"):
+                self._etags[path] = response.headers["ETag"]
+            return data
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -1,233 +1,557 @@
 import json
 import os
+import glob
+import bisect
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+class _TimeIndex:
+    """Violation ids ordered by timestamp for range lookups"""
+
+    def __init__(self):
+        self.times: List[datetime] = []
+        self.ids: List[int] = []
+
+    def add(self, timestamp: datetime, violation_id: int):
+        if not self.times or timestamp >= self.times[-1]:
+            self.times.append(timestamp)
+            self.ids.append(violation_id)
+        else:
+            position = bisect.bisect_right(self.times, timestamp)
+            self.times.insert(position, timestamp)
+            self.ids.insert(position, violation_id)
+
+    def since(self, cutoff: datetime) -> List[int]:
+        return self.ids[bisect.bisect_left(self.times, cutoff):]
+
+    def remove(self, violation_ids):
+        """Remove a set of ids, keeping the time order"""
+        kept = [(t, v_id) for t, v_id in zip(self.times, self.ids) if v_id not in violation_ids]
+        self.times = [t for t, _ in kept]
+        self.ids = [v_id for _, v_id in kept]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
 class ViolationDatabase:
+    """
+    Append-only violation store.
+
+    Violations are appended as JSON lines to size-capped segment files and
+    served from an in-memory index by guild, user and time, plus rollup
+    counters per guild/day/type/user that answer statistics queries. Deletions are
+    written as tombstone records; compact() rewrites the live records once
+    enough of the log is dead, and compact_step() cleans one sealed segment
+    at a time for background maintenance. The index is rebuilt at startup
+    by streaming the segments line by line.
+    """
+
     def __init__(self):
         self.config = Config()
         self.db_file = self.config.DATABASE_FILE
+        self.log_dir = self.config.VIOLATION_LOG_DIR
+        self.segment_max_bytes = self.config.VIOLATION_SEGMENT_MAX_BYTES
+
+        self._lock = threading.RLock()
+        self._segment = None
+        self._segment_path = None
+        self._reset_index()
+
         self._ensure_database_exists()
-    
+        self._load()
+
+    def _reset_index(self):
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._times: Dict[int, datetime] = {}
+        self._by_time = _TimeIndex()
+        self._by_guild: Dict[Any, _TimeIndex] = {}
+        self._by_user: Dict[Any, _TimeIndex] = {}
+        # Rollup counters: guild_id -> day -> Counter[(violation_type, user_id)]
+        self._rollups: Dict[Any, Dict[date, Counter]] = {}
+        self._usernames: Dict[Any, str] = {}
+        self._next_id = 1
+        self._dead_records = 0
+        # Segment bookkeeping for incremental compaction
+        self._segment_of: Dict[int, str] = {}
+        self._segment_dead = Counter()
+        self._segment_tombstones = Counter()
+        self._compactions = 0
+
     def _ensure_database_exists(self):
-        """Create database file if it doesn't exist"""
-        if not os.path.exists(self.db_file):
-            self._create_empty_database()
-    
-    def _create_empty_database(self):
-        """Create an empty database file"""
-        try:
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump({"violations": []}, f, ensure_ascii=False, indent=2)
-            logger.info(f"Created new database file: {self.db_file}")
-        except Exception as e:
-            logger.error(f"Failed to create database file: {e}")
-    
-    def _load_data(self) -> Dict[str, Any]:
-        """Load data from database file"""
+        """Create the segment directory and import the legacy JSON file once"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        if not self._segment_paths() and os.path.exists(self.db_file):
+            self._import_legacy_file()
+
+    def _segment_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.log_dir, "violations-*.jsonl")))
+
+    def _import_legacy_file(self):
+        """Copy violations from the old whole-file JSON database into a segment"""
         try:
             with open(self.db_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            self._create_empty_database()
-            return {"violations": []}
-        except json.JSONDecodeError as e:
-            logger.error(f"Database file corrupted: {e}")
-            # Backup corrupted file and create new one
-            if os.path.exists(self.db_file):
-                backup_name = f"{self.db_file}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                os.rename(self.db_file, backup_name)
-                logger.info(f"Corrupted database backed up as: {backup_name}")
-            self._create_empty_database()
-            return {"violations": []}
-        except Exception as e:
-            logger.error(f"Error loading database: {e}")
-            return {"violations": []}
-    
-    def _save_data(self, data: Dict[str, Any]):
-        """Save data to database file"""
+                violations = json.load(f).get("violations", [])
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Could not import legacy database {self.db_file}: {e}")
+            return
+
+        if not violations:
+            return
+
+        # The old file assigned len+1 ids, which repeat after a clear; never trust them
+        for violation_id, violation in enumerate(violations, 1):
+            violation["id"] = violation_id
+
+        path = os.path.join(self.log_dir, "violations-000001.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for violation in violations:
+                f.write(json.dumps(violation, ensure_ascii=False) + "\n")
+        os.replace(self.db_file, f"{self.db_file}.migrated")
+        logger.info(f"Imported {len(violations)} violations from {self.db_file} into {path} with new ids")
+
+    def _iter_log(self) -> Iterator[tuple]:
+        """Stream every (segment path, record) from the segments in write order"""
+        for path in self._segment_paths():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield path, json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupted record {path}:{line_number}")
+
+    def _load(self):
+        """Rebuild the in-memory index with a streaming scan of the log"""
+        with self._lock:
+            self._reset_index()
+            for path, record in self._iter_log():
+                self._apply(record, path)
+            self._open_segment()
+            logger.info(f"Loaded {len(self._records)} violations from {self.log_dir}")
+
+    def _apply(self, record: Dict[str, Any], path: str):
+        """Apply one log record (violation or tombstone) to the index"""
+        op = record.get("op")
+        if op is None:
+            self._index(record, path)
+            return
+        if op == "meta":
+            self._next_id = max(self._next_id, record.get("next_id", 1))
+            return
+
+        self._segment_tombstones[path] += 1
+        if op == "delete":
+            self._drop(record.get("ids", []))
+        elif op == "clear":
+            self._drop(
+                v_id for v_id, v in self._records.items()
+                if record.get("guild_id") is None or v.get("guild_id") == record["guild_id"]
+            )
+        elif op == "expire":
+            cutoff = datetime.fromisoformat(record["before"])
+            self._drop(self._by_time.ids[:bisect.bisect_left(self._by_time.times, cutoff)])
+
+    def _index(self, violation: Dict[str, Any], path: str):
+        # Check every field the indexes and rollup read before touching any of them
         try:
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save database: {e}")
-    
-    def add_violation(self, user_id: int, username: str, violation_type: str, 
+            violation_id = violation["id"]
+            timestamp = datetime.fromisoformat(violation["timestamp"])
+            violation["violation_type"], violation["user_id"]
+            if not isinstance(violation_id, int):
+                raise ValueError(f"id {violation_id!r} is not an integer")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Invalid violation data: {e}")
+            return
+
+        # Already indexed (replay after an interrupted compaction)
+        if violation_id in self._records:
+            return
+
+        self._records[violation_id] = violation
+        self._times[violation_id] = timestamp
+        self._segment_of[violation_id] = path
+        self._by_time.add(timestamp, violation_id)
+        self._by_guild.setdefault(violation.get("guild_id"), _TimeIndex()).add(timestamp, violation_id)
+        self._by_user.setdefault(violation.get("user_id"), _TimeIndex()).add(timestamp, violation_id)
+        self._count(violation, timestamp)
+        self._next_id = max(self._next_id, violation_id + 1)
+
+    def _count(self, violation: Dict[str, Any], timestamp: datetime):
+        """Add one violation to the per guild/day/type/user rollup"""
+        days = self._rollups.setdefault(violation.get("guild_id"), {})
+        days.setdefault(timestamp.date(), Counter())[(violation["violation_type"], violation["user_id"])] += 1
+        self._usernames[violation["user_id"]] = violation.get("username") or str(violation["user_id"])
+
+    def _uncount(self, violation: Dict[str, Any], timestamp: datetime):
+        """Remove one violation from the rollup"""
+        guild_id = violation.get("guild_id")
+        days = self._rollups.get(guild_id, {})
+        counter = days.get(timestamp.date())
+        if counter is None:
+            return
+        key = (violation["violation_type"], violation["user_id"])
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+            if not counter:
+                del days[timestamp.date()]
+                if not days:
+                    del self._rollups[guild_id]
+
+    def _drop(self, violation_ids) -> int:
+        """Remove violations from the index, touching only the affected entries"""
+        dropped = {}
+        for violation_id in list(violation_ids):
+            violation = self._records.pop(violation_id, None)
+            if violation is not None:
+                dropped[violation_id] = violation
+                timestamp = self._times.pop(violation_id)
+                self._segment_dead[self._segment_of.pop(violation_id, None)] += 1
+                self._uncount(violation, timestamp)
+
+        if dropped:
+            self._dead_records += len(dropped)
+            self._by_time.remove(dropped)
+            for indexes, field in ((self._by_guild, "guild_id"), (self._by_user, "user_id")):
+                for key in {violation.get(field) for violation in dropped.values()}:
+                    index = indexes.get(key)
+                    if index is not None:
+                        index.remove(dropped)
+                        if not index:
+                            del indexes[key]
+        return len(dropped)
+
+    def _open_segment(self):
+        """Open the newest segment for appending, rolling over when it is full"""
+        if self._segment:
+            self._segment.close()
+
+        paths = self._segment_paths()
+        if paths and os.path.getsize(paths[-1]) < self.segment_max_bytes:
+            path = paths[-1]
+        else:
+            number = int(os.path.basename(paths[-1])[11:17]) + 1 if paths else 1
+            path = os.path.join(self.log_dir, f"violations-{number:06d}.jsonl")
+
+        # Terminate a line left half-written by a crash before appending
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        self._segment = open(path, 'a', encoding='utf-8')
+        self._segment_path = path
+        if needs_newline:
+            self._segment.write("\n")
+        elif self._segment.tell() == 0:
+            # Keeps ids monotonic when older segments are compacted away
+            self._segment.write(json.dumps({"op": "meta", "next_id": self._next_id}) + "\n")
+            self._segment.flush()
+
+    def _append(self, record: Dict[str, Any]) -> str:
+        """Append one record to the active segment; returns the segment path"""
+        path = self._segment_path
+        if record.get("op") not in (None, "meta"):
+            self._segment_tombstones[path] += 1
+        self._segment.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._segment.flush()
+        if self._segment.tell() >= self.segment_max_bytes:
+            self._open_segment()
+        return path
+
+    def add_violation(self, user_id: int, username: str, violation_type: str,
                      message_content: str, channel_id: int, guild_id: int):
         """Add a new violation to the database"""
         try:
-            data = self._load_data()
-            
-            violation = {
-                "id": len(data["violations"]) + 1,
-                "user_id": user_id,
-                "username": username,
-                "violation_type": violation_type,
-                "message_content": message_content[:500],  # Limit message length
-                "channel_id": channel_id,
-                "guild_id": guild_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "handled": True
-            }
-            
-            data["violations"].append(violation)
-            self._save_data(data)
-            
+            with self._lock:
+                violation = {
+                    "id": self._next_id,
+                    "user_id": user_id,
+                    "username": username,
+                    "violation_type": violation_type,
+                    "message_content": message_content[:500],  # Limit message length
+                    "channel_id": channel_id,
+                    "guild_id": guild_id,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "handled": True
+                }
+
+                path = self._append(violation)
+                self._index(violation, path)
+
             logger.info(f"Added violation for user {username} ({user_id}): {violation_type}")
-            
+
         except Exception as e:
             logger.error(f"Failed to add violation: {e}")
-    
+
+    def _select(self, index: Optional[_TimeIndex], cutoff: datetime, guild_id: int = None) -> List[Dict[str, Any]]:
+        """Copy the violations of an index entry newer than cutoff"""
+        if index is None:
+            return []
+        with self._lock:
+            violations = [self._records[v_id] for v_id in index.since(cutoff)]
+        if guild_id is not None:
+            violations = [v for v in violations if v.get("guild_id") == guild_id]
+        return [dict(v) for v in violations]
+
+    def iter_violations(self) -> Iterator[Dict[str, Any]]:
+        """Yield a copy of every live violation in time order"""
+        with self._lock:
+            violation_ids = list(self._by_time.ids)
+        for violation_id in violation_ids:
+            violation = self._records.get(violation_id)
+            if violation is not None:
+                yield dict(violation)
+
     def get_violations_last_week(self, guild_id: int = None) -> List[Dict[str, Any]]:
         """Get all violations from the last week for a specific guild"""
         try:
-            data = self._load_data()
             one_week_ago = datetime.utcnow() - timedelta(days=7)
-            
-            filtered_violations = []
-            for violation in data["violations"]:
-                try:
-                    violation_time = datetime.fromisoformat(violation["timestamp"])
-                    if violation_time >= one_week_ago:
-                        if guild_id is None or violation.get("guild_id") == guild_id:
-                            filtered_violations.append(violation)
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"Invalid violation timestamp: {e}")
-                    continue
-            
-            return filtered_violations
-            
+            index = self._by_time if guild_id is None else self._by_guild.get(guild_id)
+            return self._select(index, one_week_ago)
+
         except Exception as e:
             logger.error(f"Failed to get violations: {e}")
             return []
-    
+
     def get_user_violations(self, user_id: int, guild_id: int = None, days: int = 30) -> List[Dict[str, Any]]:
         """Get violations for a specific user"""
         try:
-            data = self._load_data()
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            user_violations = []
-            for violation in data["violations"]:
-                try:
-                    if violation["user_id"] == user_id:
-                        violation_time = datetime.fromisoformat(violation["timestamp"])
-                        if violation_time >= cutoff_date:
-                            if guild_id is None or violation.get("guild_id") == guild_id:
-                                user_violations.append(violation)
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"Invalid violation data: {e}")
-                    continue
-            
-            return user_violations
-            
+            return self._select(self._by_user.get(user_id), cutoff_date, guild_id)
+
         except Exception as e:
             logger.error(f"Failed to get user violations: {e}")
             return []
-    
+
     def get_violation_stats(self, guild_id: int, days: int = 7) -> Dict[str, Any]:
         """Get violation statistics for a guild"""
         try:
-            violations = self.get_violations_last_week(guild_id) if days == 7 else self._get_violations_last_n_days(guild_id, days)
-            
-            stats = {
-                "total_violations": len(violations),
-                "violation_types": {},
-                "top_violators": {},
-                "daily_breakdown": {},
-                "average_per_day": 0
-            }
-            
-            for violation in violations:
-                # Count by type
-                v_type = violation["violation_type"]
-                stats["violation_types"][v_type] = stats["violation_types"].get(v_type, 0) + 1
-                
-                # Count by user
-                user_id = violation["user_id"]
-                username = violation["username"]
-                if user_id not in stats["top_violators"]:
-                    stats["top_violators"][user_id] = {"username": username, "count": 0}
-                stats["top_violators"][user_id]["count"] += 1
-                
-                # Daily breakdown
-                violation_date = datetime.fromisoformat(violation["timestamp"]).date()
-                date_str = violation_date.isoformat()
-                stats["daily_breakdown"][date_str] = stats["daily_breakdown"].get(date_str, 0) + 1
-            
-            # Calculate average per day
-            if days > 0:
-                stats["average_per_day"] = round(len(violations) / days, 2)
-            
-            return stats
-            
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            boundary_day = cutoff.date()
+            rows = []
+
+            with self._lock:
+                # Whole days after the cutoff come straight from the rollups
+                guild_days = self._rollups.get(guild_id, {})
+                for offset in range(1, days + 2):
+                    day = boundary_day + timedelta(days=offset)
+                    for (v_type, user_id), count in guild_days.get(day, {}).items():
+                        rows.append((day, v_type, user_id, self._usernames.get(user_id), count))
+
+                # The partial day at the cutoff is counted from the raw records
+                index = self._by_guild.get(guild_id)
+                for violation_id in (index.since(cutoff) if index else []):
+                    if self._times[violation_id].date() != boundary_day:
+                        break
+                    violation = self._records[violation_id]
+                    rows.append((boundary_day, violation["violation_type"], violation["user_id"], violation["username"], 1))
+
+            return summarize_rollups(rows, days)
+
         except Exception as e:
             logger.error(f"Failed to get violation stats: {e}")
             return {"total_violations": 0, "violation_types": {}, "top_violators": {}, "daily_breakdown": {}, "average_per_day": 0}
-    
+
     def _get_violations_last_n_days(self, guild_id: int, days: int) -> List[Dict[str, Any]]:
         """Get violations from the last N days"""
         try:
-            data = self._load_data()
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            filtered_violations = []
-            for violation in data["violations"]:
-                try:
-                    violation_time = datetime.fromisoformat(violation["timestamp"])
-                    if violation_time >= cutoff_date:
-                        if violation.get("guild_id") == guild_id:
-                            filtered_violations.append(violation)
-                except (ValueError, KeyError):
-                    continue
-            
-            return filtered_violations
-            
+            return self._select(self._by_guild.get(guild_id), cutoff_date)
+
         except Exception as e:
             logger.error(f"Failed to get violations for last {days} days: {e}")
             return []
-    
+
     def clear_violations(self, guild_id: int = None):
         """Clear all violations for a guild or all violations"""
         try:
-            data = self._load_data()
-            
-            if guild_id is None:
-                # Clear all violations
-                data["violations"] = []
-                logger.info("Cleared all violations")
-            else:
-                # Clear violations for specific guild
-                original_count = len(data["violations"])
-                data["violations"] = [v for v in data["violations"] if v.get("guild_id") != guild_id]
-                cleared_count = original_count - len(data["violations"])
-                logger.info(f"Cleared {cleared_count} violations for guild {guild_id}")
-            
-            self._save_data(data)
-            
+            with self._lock:
+                self._append({"op": "clear", "guild_id": guild_id, "timestamp": datetime.utcnow().isoformat()})
+
+                if guild_id is None:
+                    cleared_count = self._drop(list(self._records))
+                    logger.info("Cleared all violations")
+                else:
+                    index = self._by_guild.get(guild_id)
+                    cleared_count = self._drop(index.ids if index else [])
+                    logger.info(f"Cleared {cleared_count} violations for guild {guild_id}")
+
+                self._maybe_compact()
+
         except Exception as e:
             logger.error(f"Failed to clear violations: {e}")
-    
+
     def cleanup_old_violations(self, days: int = 30):
         """Remove violations older than specified days"""
         try:
-            data = self._load_data()
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            original_count = len(data["violations"])
-            data["violations"] = [
-                v for v in data["violations"]
-                if datetime.fromisoformat(v["timestamp"]) >= cutoff_date
-            ]
-            removed_count = original_count - len(data["violations"])
-            
-            if removed_count > 0:
-                self._save_data(data)
-                logger.info(f"Cleaned up {removed_count} old violations (older than {days} days)")
-            
+
+            with self._lock:
+                expired = self._by_time.ids[:bisect.bisect_left(self._by_time.times, cutoff_date)]
+                if not expired:
+                    return
+
+                self._append({"op": "expire", "before": cutoff_date.isoformat()})
+                removed_count = self._drop(expired)
+                self._maybe_compact()
+
+            logger.info(f"Cleaned up {removed_count} old violations (older than {days} days)")
+
         except Exception as e:
             logger.error(f"Failed to cleanup old violations: {e}")
+
+    def _maybe_compact(self):
+        """Compact once tombstoned records outnumber the live ones"""
+        if self._dead_records > max(len(self._records), self.config.VIOLATION_COMPACT_MIN_DEAD):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the live records into fresh segments and drop the old ones"""
+        with self._lock:
+            old_paths = self._segment_paths()
+            self._segment.close()
+            self._segment = None
+
+            tmp_path = os.path.join(self.log_dir, "compact.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # Keep ids monotonic even when every record has been dropped
+                f.write(json.dumps({"op": "meta", "next_id": self._next_id}) + "\n")
+                for violation_id in self._by_time.ids:
+                    f.write(json.dumps(self._records[violation_id], ensure_ascii=False) + "\n")
+
+            # Replace first, then remove: replaying leftovers after a crash is idempotent
+            first_path = os.path.join(self.log_dir, "violations-000001.jsonl")
+            os.replace(tmp_path, first_path)
+            for path in old_paths:
+                if path != first_path:
+                    os.remove(path)
+
+            self._dead_records = 0
+            self._segment_of = dict.fromkeys(self._records, first_path)
+            self._segment_dead.clear()
+            self._segment_tombstones.clear()
+            self._compactions += 1
+            self._open_segment()
+            logger.info(f"Compacted violation log to {len(self._records)} live records")
+
+    def compact_step(self) -> bool:
+        """
+        Rewrite the oldest sealed segment that still holds dead records or
+        tombstones, keeping only its live records. Segments are cleaned
+        oldest first, so a dropped tombstone can only refer to records that
+        are already gone. The file is written outside the lock; returns
+        False once every sealed segment is clean.
+        """
+        with self._lock:
+            for path in self._segment_paths():
+                if path == self._segment_path:
+                    return False
+                if self._segment_dead[path] or self._segment_tombstones[path]:
+                    break
+            else:
+                return False
+            violation_ids = sorted(v_id for v_id, v_path in self._segment_of.items() if v_path == path)
+            records = [self._records[v_id] for v_id in violation_ids]
+            dead_before = self._segment_dead[path]
+            compactions = self._compactions
+            next_id = self._next_id
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "meta", "next_id": next_id}) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        with self._lock:
+            # Records of this segment were dropped meanwhile; retry on the next step
+            if self._segment_dead[path] != dead_before or self._compactions != compactions:
+                os.remove(tmp_path)
+                return True
+            if records:
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+                os.remove(path)
+            self._dead_records = max(0, self._dead_records - dead_before)
+            del self._segment_dead[path]
+            del self._segment_tombstones[path]
+        logger.info(f"Compacted {os.path.basename(path)} to {len(records)} live records")
+        return True
+
+    def collect_expired(self, policy, limit: int) -> List[Dict[str, Any]]:
+        """Up to limit violations past their guild's retention, oldest first"""
+        expired = []
+        with self._lock:
+            for timestamp, violation_id in zip(self._by_time.times, self._by_time.ids):
+                if timestamp >= policy.latest_cutoff:
+                    break
+                violation = self._records[violation_id]
+                cutoff = policy.cutoff(violation.get("guild_id"))
+                if cutoff is not None and timestamp < cutoff:
+                    expired.append(dict(violation))
+                    if len(expired) >= limit:
+                        break
+        return expired
+
+    def delete_violations(self, violations: List[Dict[str, Any]]) -> int:
+        """Delete specific violations (already archived) with one tombstone"""
+        violation_ids = [violation["id"] for violation in violations]
+        if not violation_ids:
+            return 0
+        with self._lock:
+            self._append({"op": "delete", "ids": violation_ids, "timestamp": datetime.utcnow().isoformat()})
+            return self._drop(violation_ids)
+
+def summarize_rollups(rows: Iterable[tuple], days: int) -> Dict[str, Any]:
+    """Build violation statistics from (day, violation_type, user_id, username, count) rows"""
+    stats = {
+        "total_violations": 0,
+        "violation_types": {},
+        "top_violators": {},
+        "daily_breakdown": {},
+        "average_per_day": 0
+    }
+
+    for day, v_type, user_id, username, count in rows:
+        stats["total_violations"] += count
+
+        # Count by type
+        stats["violation_types"][v_type] = stats["violation_types"].get(v_type, 0) + count
+
+        # Count by user
+        if user_id not in stats["top_violators"]:
+            stats["top_violators"][user_id] = {"username": username, "count": 0}
+        stats["top_violators"][user_id]["count"] += count
+
+        # Daily breakdown
+        date_str = day if isinstance(day, str) else day.isoformat()
+        stats["daily_breakdown"][date_str] = stats["daily_breakdown"].get(date_str, 0) + count
+
+    stats["top_violators"] = dict(sorted(stats["top_violators"].items(), key=lambda item: item[1]["count"], reverse=True))
+    stats["daily_breakdown"] = dict(sorted(stats["daily_breakdown"].items()))
+
+    # Calculate average per day
+    if days > 0:
+        stats["average_per_day"] = round(stats["total_violations"] / days, 2)
+
+    return stats
+
+def create_violation_database():
+    """Create the violation storage engine selected by Config.DATABASE_ENGINE"""
+    engine = Config.DATABASE_ENGINE.lower()
+    if engine == "sqlite":
+        from sqlite_database import SQLiteViolationDatabase
+        return SQLiteViolationDatabase()
+    if engine != "jsonl":
+        logger.warning(f"Unknown DATABASE_ENGINE '{engine}', using jsonl")
+    return ViolationDatabase()
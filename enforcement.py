@@ -0,0 +1,118 @@
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+import discord
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from metrics import ENFORCEMENT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# (name, rate-limit bucket, coroutine factory)
+Action = Tuple[str, Optional[str], Callable[[], Awaitable]]
+
+class EnforcementExecutor:
+    """
+    Runs moderation actions (delete, timeout, DM, logging) for a violation.
+    
+    Critical actions are issued concurrently and awaited together, so the
+    user-visible effect costs one Discord round trip. Background actions are
+    fire-and-forget tasks kept off the critical path. Every action retries
+    429s and transient server errors; a 429 also pauses later actions in the
+    same bucket until its Retry-After has elapsed.
+    """
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._bucket_reset: Dict[str, float] = {}
+        self._tasks = set()
+        self.stats = {"succeeded": 0, "failed": 0, "retried": 0, "rate_limited": 0}
+    
+    async def enforce(self, critical: List[Action], background: List[Action] = None) -> Dict[str, bool]:
+        """Run critical actions concurrently and queue the background ones"""
+        results = await asyncio.gather(*[self.run_action(*action) for action in critical])
+        for action in background or []:
+            self.spawn(self.run_action(*action))
+        return {name: ok for (name, _, _), ok in zip(critical, results)}
+    
+    def spawn(self, coro: Awaitable):
+        """Run a coroutine in the background and keep a reference until it is done"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def run_action(self, name: str, bucket: Optional[str], factory: Callable[[], Awaitable]) -> bool:
+        """Run one action with per-action retries; returns True on success"""
+        started = time.perf_counter()
+        succeeded = await self._run_with_retries(name, bucket, factory)
+        ENFORCEMENT_SECONDS.observe(
+            time.perf_counter() - started, action=name, outcome="ok" if succeeded else "failed"
+        )
+        return succeeded
+    
+    async def _run_with_retries(self, name: str, bucket: Optional[str], factory: Callable[[], Awaitable]) -> bool:
+        for attempt in range(1, self.max_retries + 1):
+            await self._wait_for_bucket(bucket)
+            try:
+                await factory()
+                self.stats["succeeded"] += 1
+                return True
+            except (discord.Forbidden, discord.NotFound) as e:
+                # Missing permissions, closed DMs or already deleted: retrying will not help
+                logger.warning(f"Enforcement action '{name}' not permitted: {e}")
+                break
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    delay = self._retry_after(e)
+                    self.stats["rate_limited"] += 1
+                    if bucket:
+                        self._bucket_reset[bucket] = time.monotonic() + delay
+                elif e.status >= 500:
+                    delay = self._backoff(attempt)
+                else:
+                    logger.error(f"Enforcement action '{name}' failed: {e}")
+                    break
+            except (asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+                delay = self._backoff(attempt)
+                logger.debug(f"Enforcement action '{name}' transport error: {e}")
+            except Exception as e:
+                logger.error(f"Enforcement action '{name}' failed: {e}")
+                break
+            
+            if attempt < self.max_retries:
+                self.stats["retried"] += 1
+                logger.info(f"Retrying enforcement action '{name}' in {delay:.2f}s (attempt {attempt})")
+                await asyncio.sleep(delay)
+        
+        self.stats["failed"] += 1
+        return False
+    
+    async def _wait_for_bucket(self, bucket: Optional[str]):
+        if not bucket:
+            return
+        delay = self._bucket_reset.get(bucket, 0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            self._bucket_reset.pop(bucket, None)
+    
+    def _retry_after(self, error: discord.HTTPException) -> float:
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is None and getattr(error, "response", None) is not None:
+            try:
+                retry_after = float(error.response.headers.get("Retry-After", 0))
+            except (TypeError, ValueError):
+                retry_after = None
+        return min(self.max_delay, retry_after or self.base_delay)
+    
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * (2 ** (attempt - 1))) * (1 + random.random() * 0.1)
+    
+    async def close(self, timeout: float = 10.0):
+        """Give background actions a chance to finish on shutdown"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
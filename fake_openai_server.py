@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI chat-completions server for local testing of the AI moderation path.
+
+Usage:
+    python fake_openai_server.py --port 8089 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=test python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from aiohttp import web
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def classify(text: str) -> dict:
+    """Cheap stand-in verdict based on the Config profanity list"""
+    text_lower = text.lower()
+    for word in Config.PROFANITY_WORDS:
+        if word in text_lower:
+            return {
+                "is_violation": True,
+                "violation_type": "Ngôn từ thô tục",
+                "confidence": 0.95,
+                "reason": f"Fake server: chứa từ '{word}'"
+            }
+    return {"is_violation": False, "violation_type": "", "confidence": 0.9, "reason": "Fake server: hợp lệ"}
+
+def parse_batch(user_message: str):
+    """Return the [{"id", "text"}] list of a batched request, or None"""
+    start = user_message.find("[{")
+    if start < 0:
+        return None
+    try:
+        items = json.loads(user_message[start:])
+    except json.JSONDecodeError:
+        return None
+    return items if isinstance(items, list) else None
+
+def create_app(latency_ms: float = 0.0) -> web.Application:
+    """Build the fake server application with a fixed response latency"""
+    app = web.Application()
+    app["latency"] = latency_ms / 1000.0
+    app["requests"] = 0
+    
+    async def chat_completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        request.app["requests"] += 1
+        if request.app["latency"]:
+            await asyncio.sleep(request.app["latency"])
+        
+        user_message = payload["messages"][-1]["content"]
+        batch = parse_batch(user_message)
+        if batch is not None:
+            verdict = {"results": [dict(classify(item["text"]), id=item["id"]) for item in batch]}
+        else:
+            verdict = classify(user_message)
+        
+        return web.json_response({
+            "id": f"chatcmpl-fake-{request.app['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(verdict, ensure_ascii=False)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+    
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(args.latency_ms), host=args.host, port=args.port)
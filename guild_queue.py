@@ -0,0 +1,144 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List
+from metrics import QUEUE_WAIT_SECONDS, SHED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+class GuildWorkQueue:
+    """
+    Bounded per-guild work queues drained by a fixed worker pool.
+    
+    Guilds with pending work are served round-robin, one item per turn, so a
+    busy guild cannot starve the others. When a guild's backlog (or the total
+    backlog) passes its degrade threshold, items are handed to the handler
+    with degraded=True so it can skip expensive stages; when a guild's queue
+    is full, new items for that guild are shed.
+    """
+    
+    def __init__(self, handler: Callable[[Any, bool], Awaitable], workers: int = 8,
+                 max_per_guild: int = 500, guild_degrade_depth: int = 50, total_degrade_depth: int = 1000):
+        self.handler = handler
+        self.worker_count = workers
+        self.max_per_guild = max_per_guild
+        self.guild_degrade_depth = guild_degrade_depth
+        self.total_degrade_depth = total_degrade_depth
+        
+        self._queues: Dict[Any, Deque] = {}
+        self._ready: Deque = deque()
+        self._available = asyncio.Semaphore(0)
+        self._workers: List[asyncio.Task] = []
+        self.depth = 0
+        self._in_flight = 0
+        
+        self.processed = 0
+        self.degraded = 0
+        self.shed = 0
+        self._guild_stats: Dict[Any, Dict[str, float]] = {}
+    
+    def start(self):
+        """Start the worker pool"""
+        loop = asyncio.get_running_loop()
+        self._workers = [loop.create_task(self._worker(index)) for index in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} moderation workers")
+    
+    def submit(self, guild_id, item) -> bool:
+        """Queue an item for its guild; returns False if it was shed"""
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = deque()
+        
+        if len(queue) >= self.max_per_guild:
+            SHED_TOTAL.inc(guild=guild_id)
+            self.shed += 1
+            self._stats_for(guild_id)["shed"] += 1
+            return False
+        
+        if not queue:
+            self._ready.append(guild_id)
+        queue.append((time.monotonic(), item))
+        self.depth += 1
+        self._available.release()
+        return True
+    
+    def _next(self):
+        """Pop the next item, rotating through guilds with pending work"""
+        guild_id = self._ready.popleft()
+        queue = self._queues[guild_id]
+        enqueued_at, item = queue.popleft()
+        guild_depth = len(queue)
+        if queue:
+            self._ready.append(guild_id)
+        else:
+            del self._queues[guild_id]
+        self.depth -= 1
+        return guild_id, enqueued_at, item, guild_depth
+    
+    async def _worker(self, index: int):
+        while True:
+            await self._available.acquire()
+            guild_id, enqueued_at, item, guild_depth = self._next()
+            
+            wait = time.monotonic() - enqueued_at
+            QUEUE_WAIT_SECONDS.observe(wait, guild=guild_id)
+            stats = self._stats_for(guild_id)
+            stats["last_wait"] = wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+            stats["avg_wait"] = wait if not stats["processed"] else stats["avg_wait"] * 0.9 + wait * 0.1
+            stats["processed"] += 1
+            
+            degraded = guild_depth >= self.guild_degrade_depth or self.depth >= self.total_degrade_depth
+            if degraded:
+                self.degraded += 1
+                stats["degraded"] += 1
+            
+            self._in_flight += 1
+            try:
+                await self.handler(item, degraded)
+            except Exception as e:
+                logger.error(f"Moderation worker {index} failed: {e}")
+            finally:
+                self._in_flight -= 1
+            self.processed += 1
+    
+    def _stats_for(self, guild_id) -> Dict[str, float]:
+        stats = self._guild_stats.get(guild_id)
+        if stats is None:
+            stats = self._guild_stats[guild_id] = {
+                "processed": 0, "degraded": 0, "shed": 0, "last_wait": 0.0, "avg_wait": 0.0, "max_wait": 0.0
+            }
+        return stats
+    
+    def guild_depths(self) -> Dict[Any, int]:
+        return {guild_id: len(queue) for guild_id, queue in self._queues.items()}
+    
+    def guild_depth(self, guild_id) -> int:
+        queue = self._queues.get(guild_id)
+        return len(queue) if queue else 0
+    
+    def get_stats(self, guild_id=None) -> Dict[str, Any]:
+        """Queue depth, wait times and shed/degraded counts"""
+        stats = {
+            "depth": self.depth,
+            "active_guilds": len(self._queues),
+            "workers": self.worker_count,
+            "processed": self.processed,
+            "degraded": self.degraded,
+            "shed": self.shed,
+        }
+        if guild_id is not None:
+            stats["guild"] = dict(self._stats_for(guild_id), depth=self.guild_depth(guild_id))
+        return stats
+    
+    async def join(self, poll_seconds: float = 0.05):
+        """Wait until every queued item has been handled, including the ones workers are on"""
+        while self.depth or self._in_flight:
+            await asyncio.sleep(poll_seconds)
+    
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,161 @@
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Dashboard FilterKeyword categories handled by the matcher
+KEYWORD_CATEGORIES = ("PROFANITY", "HARASSMENT", "OFFENSIVE", "SPAM")
+
+
+class KeywordMatch(NamedTuple):
+    """A single keyword hit inside a (lowercased) message"""
+    start: int
+    end: int
+    keyword: str
+    category: str
+    severity: str
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over all filter keywords.
+
+    The automaton is built once from the keyword lists and then scans a
+    message in a single pass, reporting every hit of every category with
+    its offsets in the lowercased text.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable]):
+        # Each state: goto transitions, failure link and output patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        # Pattern table: (keyword, category, severity)
+        self._patterns: List[tuple] = []
+        self._seen = set()
+
+        for category, entries in keywords.items():
+            for entry in entries:
+                self._add(category, entry)
+
+        self._build_failure_links()
+
+    @classmethod
+    def build(cls, config, extra_keywords: Optional[Dict[str, Iterable]] = None) -> "KeywordMatcher":
+        """
+        Build a matcher from the Config keyword lists plus optional
+        dashboard keywords (same shape as the /api/keywords response)
+        """
+        keywords = {
+            "PROFANITY": list(config.PROFANITY_WORDS),
+            "HARASSMENT": list(config.HARASSMENT_KEYWORDS),
+            "OFFENSIVE": list(config.OFFENSIVE_KEYWORDS),
+        }
+        for category, entries in (extra_keywords or {}).items():
+            if category not in KEYWORD_CATEGORIES:
+                continue
+            keywords.setdefault(category, []).extend(entries)
+
+        matcher = cls(keywords)
+        logger.info(f"Built keyword matcher with {len(matcher)} keywords")
+        return matcher
+
+    @classmethod
+    def from_filter_keywords(cls, config, filter_keywords: Iterable) -> "KeywordMatcher":
+        """Build a matcher from Config lists plus FilterKeyword rows"""
+        extra: Dict[str, List[Dict[str, str]]] = {}
+        for row in filter_keywords:
+            if not getattr(row, "is_active", True):
+                continue
+            extra.setdefault(row.category, []).append({
+                "keyword": row.keyword,
+                "severity": row.severity or "medium",
+            })
+        return cls.build(config, extra)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def export_keywords(self) -> Dict[str, List[Dict[str, str]]]:
+        """Every keyword by category, in the /api/keywords shape accepted by __init__"""
+        keywords: Dict[str, List[Dict[str, str]]] = {}
+        for keyword, category, severity in sorted(self._patterns):
+            keywords.setdefault(category, []).append({"keyword": keyword, "severity": severity})
+        return keywords
+
+    def _add(self, category: str, entry):
+        """Insert a keyword (plain string or /api/keywords dict) into the trie"""
+        if isinstance(entry, dict):
+            keyword = entry.get("keyword", "")
+            severity = entry.get("severity") or "medium"
+        else:
+            keyword = entry
+            severity = "medium"
+
+        keyword = (keyword or "").strip().lower()
+        if not keyword or (keyword, category) in self._seen:
+            return
+        self._seen.add((keyword, category))
+
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+
+        self._output[state].append(len(self._patterns))
+        self._patterns.append((keyword, category, severity))
+
+    def _build_failure_links(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def scan_lowered(self, text: str) -> List[KeywordMatch]:
+        """Scan text that is already lowercased; returns matches ordered by end offset"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        patterns = self._patterns
+
+        matches: List[KeywordMatch] = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                end = index + 1
+                for pattern_id in output[state]:
+                    keyword, category, severity = patterns[pattern_id]
+                    matches.append(KeywordMatch(end - len(keyword), end, keyword, category, severity))
+        return matches
+
+    def scan(self, content: str) -> List[KeywordMatch]:
+        """Lowercase the message once and return every keyword hit"""
+        return self.scan_lowered(content.lower())
+
+    def scan_by_category(self, content: str) -> Dict[str, List[KeywordMatch]]:
+        """Group every keyword hit by category"""
+        grouped: Dict[str, List[KeywordMatch]] = {}
+        for match in self.scan(content):
+            grouped.setdefault(match.category, []).append(match)
+        return grouped
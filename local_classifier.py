@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Local text classifier: hashed character n-grams feeding a softmax model.
+
+Scores a message in-process with NumPy so confident cases never reach the
+AI. The model is trained offline from the labelled violation history plus a
+corpus of clean messages, calibrated with Platt scaling on a held-out split
+and saved as a versioned .npz file that ModerationService loads at startup.
+
+Usage:
+    python local_classifier.py train --clean clean_messages.txt
+    python local_classifier.py score "tin nhắn cần kiểm tra"
+"""
+
+import os
+import json
+import time
+import zlib
+import random
+import logging
+import argparse
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from config import Config
+from verdict_cache import normalize_content
+
+try:
+    import numpy as np
+except ImportError:  # The classifier stage is skipped when NumPy is missing
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT_VERSION = 1
+CLEAN_LABEL = "clean"
+MAX_CHARS = 300
+# Chat repeats the same n-grams constantly; hashing each one once is most of the speedup
+GRAM_CACHE_SIZE = 200_000
+
+class ClassifierVerdict(NamedTuple):
+    """Calibrated probability that a message violates, and its likeliest type"""
+    confidence: float
+    violation_type: str
+
+def strip_accents(text: str) -> str:
+    """Vietnamese text without diacritics, so "dit" and "địt" share n-grams"""
+    decomposed = unicodedata.normalize("NFD", text.replace("đ", "d"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+class LocalClassifier:
+    """Softmax regression over hashed character n-grams with Platt calibration"""
+
+    def __init__(self, weights, bias, classes: Sequence[str], hash_bits: int = 18,
+                 ngram_range: Tuple[int, int] = (2, 4), platt: Tuple[float, float] = (1.0, 0.0),
+                 version: str = "", metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights
+        self.bias = bias
+        self.classes = list(classes)
+        self.hash_bits = hash_bits
+        self.mask = (1 << hash_bits) - 1
+        self.ngram_range = tuple(ngram_range)
+        self.platt = tuple(platt)
+        self.version = version
+        self.metadata = metadata or {}
+        self._gram_ids: Dict[str, int] = {}
+        self._clean_index = self.classes.index(CLEAN_LABEL)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LocalClassifier"]:
+        """Load a saved model, or None if it is missing, stale or NumPy is unavailable"""
+        if not path or not os.path.exists(path):
+            return None
+        if np is None:
+            logger.warning("NumPy not installed, local classifier disabled")
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                metadata = json.loads(str(data["metadata"]))
+                if metadata.get("format_version") != MODEL_FORMAT_VERSION:
+                    logger.warning(f"Ignoring local classifier {path}: format {metadata.get('format_version')}, "
+                                   f"expected {MODEL_FORMAT_VERSION}")
+                    return None
+                model = cls(
+                    data["weights"], data["bias"], metadata["classes"],
+                    hash_bits=metadata["hash_bits"],
+                    ngram_range=tuple(metadata["ngram_range"]),
+                    platt=tuple(metadata["platt"]),
+                    version=metadata["version"],
+                    metadata=metadata
+                )
+            logger.info(f"Loaded local classifier {model.version} ({len(model.classes)} classes)")
+            return model
+        except Exception as e:
+            logger.error(f"Failed to load local classifier {path}: {e}")
+            return None
+
+    def save(self, path: str):
+        metadata = dict(
+            self.metadata,
+            format_version=MODEL_FORMAT_VERSION,
+            version=self.version,
+            classes=self.classes,
+            hash_bits=self.hash_bits,
+            ngram_range=list(self.ngram_range),
+            platt=list(self.platt),
+        )
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, metadata=json.dumps(metadata, ensure_ascii=False))
+        os.replace(tmp_path, path)
+
+    def _hashed_ngrams(self, content: str) -> List[int]:
+        text = normalize_content(content)[:MAX_CHARS]
+        variants = [(text, "")]
+        stripped = strip_accents(text)
+        if stripped != text:
+            variants.append((stripped, "\x00"))
+
+        n_min, n_max = self.ngram_range
+        cache = self._gram_ids
+        if len(cache) > GRAM_CACHE_SIZE:
+            cache.clear()
+        ids = []
+        for variant, salt in variants:
+            padded = f" {variant} "
+            for n in range(n_min, n_max + 1):
+                for start in range(len(padded) - n + 1):
+                    gram = salt + padded[start:start + n]
+                    gram_id = cache.get(gram)
+                    if gram_id is None:
+                        gram_id = cache[gram] = zlib.crc32(gram.encode("utf-8")) & self.mask
+                    ids.append(gram_id)
+        return ids
+
+    def featurize(self, contents: Iterable[str]):
+        """Sparse batch: concatenated feature ids and weights plus each row's offset"""
+        all_ids, all_values, offsets = [], [], []
+        position = 0
+        for content in contents:
+            ids, counts = np.unique(np.array(self._hashed_ngrams(content), dtype=np.int64), return_counts=True)
+            values = np.log1p(counts.astype(np.float32))
+            values /= np.sqrt(np.dot(values, values))
+            offsets.append(position)
+            position += len(ids)
+            all_ids.append(ids)
+            all_values.append(values)
+        return np.concatenate(all_ids), np.concatenate(all_values), np.array(offsets, dtype=np.int64)
+
+    def _logits(self, ids, values, offsets):
+        return np.add.reduceat(self.weights[ids] * values[:, None], offsets, axis=0) + self.bias
+
+    def _violation_scores(self, logits):
+        """Log-odds that a message is not clean, before calibration"""
+        logits = logits - logits.max(axis=1, keepdims=True)
+        clean = logits[:, self._clean_index]
+        others = np.delete(logits, self._clean_index, axis=1)
+        return np.log(np.exp(others).sum(axis=1)) - clean
+
+    def predict_many(self, contents: Sequence[str]) -> List[ClassifierVerdict]:
+        """Score a batch of messages with one vectorized pass"""
+        if not contents:
+            return []
+        logits = self._logits(*self.featurize(contents))
+        a, b = self.platt
+        confidences = 1.0 / (1.0 + np.exp(-(a * self._violation_scores(logits) + b)))
+        violation_logits = logits.copy()
+        violation_logits[:, self._clean_index] = -np.inf
+        types = violation_logits.argmax(axis=1)
+        return [ClassifierVerdict(float(c), self.classes[t]) for c, t in zip(confidences, types)]
+
+    def predict(self, content: str) -> ClassifierVerdict:
+        return self.predict_many([content])[0]
+
+def fit_platt(scores, targets, iterations: int = 100) -> Tuple[float, float]:
+    """Platt scaling: fit sigmoid(a * score + b) to held-out labels by Newton's method"""
+    positives = float(targets.sum())
+    negatives = float(len(targets) - positives)
+    # Platt's smoothed targets avoid overconfident calibration on small sets
+    t = np.where(targets > 0, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(a * scores + b)))
+        d = p - t
+        w = np.maximum(p * (1 - p), 1e-12)
+        g_a, g_b = float(np.dot(d, scores)), float(d.sum())
+        h_aa, h_ab, h_bb = float(np.dot(w, scores * scores)) + 1e-6, float(np.dot(w, scores)), float(w.sum()) + 1e-6
+        det = h_aa * h_bb - h_ab * h_ab
+        if det <= 0:
+            break
+        step_a = (h_bb * g_a - h_ab * g_b) / det
+        step_b = (h_aa * g_b - h_ab * g_a) / det
+        a, b = a - step_a, b - step_b
+        if abs(step_a) < 1e-9 and abs(step_b) < 1e-9:
+            break
+    return a, b
+
+def train_classifier(samples: List[Tuple[str, str]], hash_bits: int = 18, epochs: int = 6,
+                     learning_rate: float = 0.5, l2: float = 1e-6, batch_size: int = 256,
+                     holdout: float = 0.2, seed: int = 13) -> Tuple[LocalClassifier, Dict[str, Any]]:
+    """Train on (content, label) pairs; returns the model and held-out evaluation metrics"""
+    rng = random.Random(seed)
+    samples = list(samples)
+    rng.shuffle(samples)
+    classes = [CLEAN_LABEL] + sorted({label for _, label in samples if label != CLEAN_LABEL})
+    class_index = {label: index for index, label in enumerate(classes)}
+
+    split = int(len(samples) * (1 - holdout))
+    train, held_out = samples[:split], samples[split:]
+
+    model = LocalClassifier(
+        np.zeros((1 << hash_bits, len(classes)), dtype=np.float32),
+        np.zeros(len(classes), dtype=np.float32),
+        classes, hash_bits=hash_bits
+    )
+    features = [model.featurize([content]) for content, _ in train]
+    labels = np.array([class_index[label] for _, label in train], dtype=np.int64)
+
+    # Balanced class weights so a large clean corpus does not drown the violations
+    counts = np.bincount(labels, minlength=len(classes)).astype(np.float32)
+    class_weights = len(labels) / (len(classes) * np.maximum(counts, 1))
+
+    accum_w = np.full_like(model.weights, 1e-8)
+    accum_b = np.full_like(model.bias, 1e-8)
+    order = list(range(len(train)))
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        loss = 0.0
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            ids = np.concatenate([features[i][0] for i in batch])
+            values = np.concatenate([features[i][1] for i in batch])
+            lengths = np.array([len(features[i][0]) for i in batch])
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+            logits = model._logits(ids, values, offsets)
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            batch_labels = labels[batch]
+            weights = class_weights[batch_labels]
+            loss -= float(np.sum(weights * np.log(probs[np.arange(len(batch)), batch_labels] + 1e-12)))
+
+            delta = probs
+            delta[np.arange(len(batch)), batch_labels] -= 1.0
+            delta *= weights[:, None] / len(batch)
+
+            # Sparse AdaGrad update, touching only the rows present in the batch
+            rows = np.repeat(np.arange(len(batch)), lengths)
+            unique_ids, inverse = np.unique(ids, return_inverse=True)
+            grad = np.zeros((len(unique_ids), len(classes)), dtype=np.float32)
+            np.add.at(grad, inverse, values[:, None] * delta[rows])
+            grad += l2 * model.weights[unique_ids]
+            accum_w[unique_ids] += grad * grad
+            model.weights[unique_ids] -= learning_rate * grad / np.sqrt(accum_w[unique_ids])
+
+            grad_b = delta.sum(axis=0)
+            accum_b += grad_b * grad_b
+            model.bias -= learning_rate * grad_b / np.sqrt(accum_b)
+        logger.info(f"Epoch {epoch + 1}/{epochs}: loss {loss / max(len(train), 1):.4f}")
+
+    # Platt scaling is fitted on one half of the holdout and the metrics come
+    # from the other half, so they are not biased by the calibration
+    calibration, evaluation = held_out[:len(held_out) // 2], held_out[len(held_out) // 2:]
+    metrics: Dict[str, Any] = {"train_samples": len(train), "calibration_samples": len(calibration),
+                               "evaluation_samples": len(evaluation),
+                               "class_counts": {c: int(n) for c, n in zip(classes, counts)}}
+    if calibration:
+        logits = model._logits(*model.featurize([content for content, _ in calibration]))
+        scores = model._violation_scores(logits)
+        targets = np.array([label != CLEAN_LABEL for _, label in calibration], dtype=np.float64)
+        model.platt = fit_platt(scores.astype(np.float64), targets)
+
+    if evaluation:
+        targets = np.array([label != CLEAN_LABEL for _, label in evaluation], dtype=np.float64)
+        verdicts = model.predict_many([content for content, _ in evaluation])
+        confidences = np.array([v.confidence for v in verdicts])
+        predicted = confidences >= 0.5
+        decisive = (confidences >= Config.LOCAL_CLASSIFIER_VIOLATION_CONFIDENCE) | \
+                   (confidences <= Config.LOCAL_CLASSIFIER_CLEAN_CONFIDENCE)
+        decisive_correct = (confidences >= 0.5) == (targets > 0)
+        metrics.update({
+            "accuracy": float(np.mean(predicted == (targets > 0))),
+            "decided_locally": float(np.mean(decisive)),
+            "decided_locally_accuracy": float(np.mean(decisive_correct[decisive])) if decisive.any() else 0.0,
+            "type_accuracy": float(np.mean([
+                v.violation_type == label for v, (_, label) in zip(verdicts, evaluation) if label != CLEAN_LABEL
+            ] or [0.0])),
+        })
+
+    model.version = f"v{MODEL_FORMAT_VERSION}-{time.strftime('%Y%m%d%H%M%S')}"
+    model.metadata = {"trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": metrics}
+    return model, metrics
+
+def iter_history(include_dashboard: bool = True) -> Iterator[Tuple[str, str]]:
+    """(content, violation_type) from the bot database, legacy JSON and dashboard ViolationLog"""
+    from database import create_violation_database
+    from sqlite_database import iter_legacy_violations
+
+    database = create_violation_database()
+    for violation in database.iter_violations():
+        yield violation.get("message_content", ""), violation.get("violation_type", "")
+
+    if os.path.exists(Config.DATABASE_FILE):
+        for violation in iter_legacy_violations(Config.DATABASE_FILE):
+            yield violation.get("message_content", ""), violation.get("violation_type", "")
+
+    if include_dashboard and Config.DATABASE_URL:
+        from sqlalchemy import create_engine, select
+        from violation_log_writer import violation_logs
+
+        engine = create_engine(Config.DATABASE_URL)
+        query = select(violation_logs.c.message_content, violation_logs.c.violation_type)
+        with engine.connect() as conn:
+            for content, violation_type in conn.execution_options(stream_results=True).execute(query):
+                yield content, violation_type
+        engine.dispose()
+
+def iter_clean_corpus(path: str) -> Iterator[str]:
+    """Clean messages from a text file (one per line) or JSONL with a "content" field"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                line = json.loads(line).get("content", "")
+            yield line
+
+def collect_samples(clean_paths: List[str], extra_paths: List[str], include_dashboard: bool,
+                    min_class_samples: int) -> List[Tuple[str, str]]:
+    from moderation import INVITE_VIOLATION_TYPE
+    from flood_detector import FLOOD_VIOLATION_TYPE, MASS_MENTION_VIOLATION_TYPE, RAID_VIOLATION_TYPE
+
+    # Verdicts decided by message structure or rate, not by the text itself
+    structural = {INVITE_VIOLATION_TYPE, FLOOD_VIOLATION_TYPE, MASS_MENTION_VIOLATION_TYPE,
+                  RAID_VIOLATION_TYPE, "Spam/Shouting"}
+
+    labelled: Dict[str, str] = {}
+    for content, label in iter_history(include_dashboard):
+        key = normalize_content(content or "")
+        if key and label and label not in structural:
+            labelled[key] = label
+    for path in extra_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    key = normalize_content(record.get("content", ""))
+                    if key and record.get("label"):
+                        labelled[key] = record["label"]
+    for path in clean_paths:
+        for content in iter_clean_corpus(path):
+            key = normalize_content(content)
+            # A message ever labelled as a violation stays a violation
+            if key:
+                labelled.setdefault(key, CLEAN_LABEL)
+
+    counts: Dict[str, int] = {}
+    for label in labelled.values():
+        counts[label] = counts.get(label, 0) + 1
+    rare = {label for label, count in counts.items() if count < min_class_samples and label != CLEAN_LABEL}
+    if rare:
+        logger.warning(f"Skipping labels with fewer than {min_class_samples} samples: {sorted(rare)}")
+    return [(content, label) for content, label in labelled.items() if label not in rare]
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or query the local moderation classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train from violation history plus clean messages")
+    train_parser.add_argument("--clean", action="append", required=True, help="Clean messages (.txt lines or .jsonl)")
+    train_parser.add_argument("--extra", action="append", default=[], help="Extra labelled JSONL: {content, label}")
+    train_parser.add_argument("--no-dashboard", action="store_true", help="Skip the dashboard ViolationLog table")
+    train_parser.add_argument("--output", default=Config.LOCAL_CLASSIFIER_PATH)
+    train_parser.add_argument("--hash-bits", type=int, default=18)
+    train_parser.add_argument("--epochs", type=int, default=6)
+    train_parser.add_argument("--min-class-samples", type=int, default=20)
+
+    score_parser = subparsers.add_parser("score", help="Score messages with a saved model")
+    score_parser.add_argument("messages", nargs="+")
+    score_parser.add_argument("--model", default=Config.LOCAL_CLASSIFIER_PATH)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=Config.LOG_FORMAT)
+    if np is None:
+        raise SystemExit("NumPy is required: pip install numpy")
+
+    if args.command == "train":
+        samples = collect_samples(args.clean, args.extra, not args.no_dashboard, args.min_class_samples)
+        labels = {label for _, label in samples}
+        if CLEAN_LABEL not in labels or len(labels) < 2:
+            raise SystemExit("Need both clean messages and labelled violations to train")
+        model, metrics = train_classifier(samples, hash_bits=args.hash_bits, epochs=args.epochs)
+        model.save(args.output)
+        print(json.dumps({"version": model.version, "output": args.output, **metrics}, ensure_ascii=False, indent=2))
+    else:
+        model = LocalClassifier.load(args.model)
+        if model is None:
+            raise SystemExit(f"No usable model at {args.model}")
+        for content, verdict in zip(args.messages, model.predict_many(args.messages)):
+            print(f"{verdict.confidence:.3f}  {verdict.violation_type:<24} {content}")
+
+if __name__ == "__main__":
+    main()
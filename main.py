@@ -1,104 +1,324 @@
 import discord
 from discord.ext import commands
 import asyncio
+import io
 import os
+import time
 import logging
 from datetime import datetime, timedelta
 from config import Config
-from moderation import ModerationService
-from database import ViolationDatabase
-from utils import setup_logging
+from moderation import ModerationService, INVITE_VIOLATION_TYPE
+from database import create_violation_database
+from keyword_matcher import KeywordMatcher
+from dashboard_sync import DashboardClient
+from enforcement import EnforcementExecutor
+from guild_queue import GuildWorkQueue
+from flood_detector import FloodDetector
+from metrics import (
+    REGISTRY, MESSAGE_SECONDS, STAGE_TOTAL, DATABASE_SECONDS, FLOOD_TOTAL,
+    metrics_app, start_http_server
+)
+from violation_log_writer import ViolationLogWriter, build_log_record
+from bot_settings import RuntimeSettings
+from cluster import write_worker_status
+from rescan import KeywordRescanner, RecentMessageWindow
+from retention import RetentionManager
+from profiler import ProfilerBusy, add_profiler_routes, profile_event_loop, memory_diff
+from utils import setup_logging, format_duration
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
-class ModerationBot(commands.Bot):
+class ModerationBot(commands.AutoShardedBot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
         
+        # Under cluster.py each process owns the shard range in SHARD_IDS
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None
+            help_command=None,
+            shard_count=Config.SHARD_COUNT,
+            shard_ids=Config.SHARD_IDS
         )
         
         self.moderation_service = ModerationService()
-        self.violation_db = ViolationDatabase()
+        self.violation_db = create_violation_database()
+        self.violation_log_writer = ViolationLogWriter.from_config()
+        self.dashboard_client = DashboardClient.from_config()
+        # Read on every message; only replaced by the dashboard sync task
+        self.runtime_settings = RuntimeSettings()
+        self.enforcement = EnforcementExecutor(max_retries=Config.ENFORCEMENT_MAX_RETRIES)
+        self.work_queue = GuildWorkQueue(
+            self.process_message,
+            workers=Config.MODERATION_WORKERS,
+            max_per_guild=Config.GUILD_QUEUE_MAX_SIZE,
+            guild_degrade_depth=Config.GUILD_QUEUE_DEGRADE_DEPTH,
+            total_degrade_depth=Config.QUEUE_DEGRADE_TOTAL_DEPTH
+        )
+        self.flood_detector = FloodDetector.from_config(Config)
+        # Recent messages kept so keyword changes can be checked against them
+        self.message_window = RecentMessageWindow(Config.RESCAN_WINDOW_SIZE) if Config.RESCAN_WINDOW_SIZE > 0 else None
+        # Shared stores (violation_logs, the clustered SQLite file) are maintained by the shard 0 worker
+        owns_shared_stores = not Config.SHARD_IDS or 0 in Config.SHARD_IDS
+        self.rescanner = KeywordRescanner.from_config(
+            self.message_window,
+            is_busy=self.background_paused,
+            scan_database=owns_shared_stores
+        )
+        self.retention = RetentionManager.from_config(self.violation_db, is_busy=self.background_paused) if owns_shared_stores else None
+        self.metrics_runner = None
+        self._background_tasks = []
+        self._register_gauges()
+    
+    def background_paused(self) -> bool:
+        """Background jobs yield while live moderation is backed up"""
+        return self.work_queue.depth > Config.RESCAN_PAUSE_QUEUE_DEPTH
+    
+    def _register_gauges(self):
+        """Gauges read from live state whenever metrics are scraped"""
+        REGISTRY.gauge(
+            "moderation_queue_depth", "Messages waiting per guild queue", ["guild"],
+            callback=lambda: [({"guild": guild_id}, depth) for guild_id, depth in self.work_queue.guild_depths().items()]
+        )
+        REGISTRY.gauge(
+            "moderation_enforcement_pending", "Background enforcement tasks in flight",
+            callback=lambda: [({}, len(self.enforcement._tasks))]
+        )
+        REGISTRY.gauge(
+            "moderation_verdict_cache_size", "Cached AI verdicts",
+            callback=lambda: [({}, self.moderation_service.verdict_cache.get_stats()["size"])]
+        )
+        REGISTRY.gauge(
+            "moderation_flood_tracked", "Users, channels and contents tracked by the flood detector", ["table"],
+            callback=lambda: [
+                ({"table": table}, self.flood_detector.get_stats()[f"tracked_{table}"])
+                for table in ("users", "channels", "contents")
+            ]
+        )
+        if self.violation_log_writer:
+            REGISTRY.gauge(
+                "moderation_violation_log_queue", "Violation rows waiting to be written to the dashboard",
+                callback=lambda: [({}, self.violation_log_writer.queue.qsize())]
+            )
         
+    async def setup_hook(self):
+        self.work_queue.start()
+        if Config.METRICS_PORT:
+            port = Config.METRICS_PORT + int(Config.CLUSTER_ID or 0)
+            try:
+                app = metrics_app()
+                add_profiler_routes(app, Config.PROFILER_TOKEN, Config.PROFILER_MAX_SECONDS)
+                self.metrics_runner = await start_http_server(app, Config.METRICS_HOST, port)
+            except OSError as e:
+                logger.error(f"Không thể mở metrics endpoint trên cổng {port}: {e}")
+        if self.violation_log_writer:
+            await self.violation_log_writer.start()
+        if self.dashboard_client:
+            self._background_tasks.append(self.loop.create_task(self.dashboard_sync_loop()))
+        self.rescanner.resume()
+        if self.retention:
+            self._background_tasks.append(self.loop.create_task(self.retention_loop()))
+        if Config.CLUSTER_ID is not None:
+            self._background_tasks.append(self.loop.create_task(self.cluster_status_loop()))
+    
+    async def start_offline(self):
+        """Bind to the running event loop and start moderating without logging in (replay harness)"""
+        await self._async_setup_hook()
+        self.work_queue.start()
+    
+    async def cluster_status_loop(self):
+        """Publish this worker's health for the cluster supervisor"""
+        name = f"bot-{Config.CLUSTER_ID}"
+        while not self.is_closed():
+            status = {
+                "name": name,
+                "role": "bot",
+                "pid": os.getpid(),
+                "ready": self.is_ready(),
+                "updated_at": time.time(),
+                "shard_ids": self.shard_ids,
+                "shard_count": self.shard_count,
+                "guilds": len(self.guilds),
+                "latency_ms": self.latency * 1000 if self.is_ready() else 0,
+                "shard_latency_ms": {str(shard_id): latency * 1000 for shard_id, latency in self.latencies},
+                "queue_depth": self.work_queue.depth,
+            }
+            try:
+                await self.loop.run_in_executor(None, write_worker_status, Config.CLUSTER_STATUS_DIR, name, status)
+            except Exception as e:
+                logger.warning(f"Không thể ghi trạng thái cluster: {e}")
+            await asyncio.sleep(Config.CLUSTER_STATUS_INTERVAL_SECONDS)
+    
+    async def retention_loop(self):
+        """Archive expired violations and compact the stores on a schedule"""
+        # Let the gateway connect and the caches warm up first
+        await asyncio.sleep(60)
+        while not self.is_closed():
+            try:
+                await self.retention.run_once()
+            except Exception as e:
+                logger.error(f"Lỗi khi dọn dẹp lịch sử vi phạm: {e}")
+            await asyncio.sleep(Config.RETENTION_INTERVAL_HOURS * 3600)
+    
+    async def dashboard_sync_loop(self):
+        """Poll the dashboard API and apply keyword and settings changes"""
+        while not self.is_closed():
+            await self.sync_keywords()
+            await self.sync_settings()
+            await asyncio.sleep(Config.DASHBOARD_SYNC_INTERVAL_SECONDS)
+    
+    async def sync_keywords(self):
+        """Hot-swap the keyword matcher when /api/keywords changes"""
+        try:
+            keywords = await self.dashboard_client.fetch("/api/keywords")
+            if keywords is not None:
+                # Build off the event loop, then swap atomically
+                matcher = await self.loop.run_in_executor(
+                    None, KeywordMatcher.build, self.moderation_service.config, keywords
+                )
+                self.moderation_service.set_keyword_matcher(matcher)
+                logger.info(f"Đã cập nhật {len(matcher)} từ khóa từ dashboard")
+                if await self.rescanner.rules_changed(matcher):
+                    logger.info("Từ khóa thay đổi, bắt đầu quét lại tin nhắn gần đây")
+        except Exception as e:
+            logger.warning(f"Không thể đồng bộ từ khóa từ dashboard: {e}")
+    
+    async def sync_settings(self):
+        """Replace the runtime settings snapshot when /api/settings changes"""
+        try:
+            raw_settings = await self.dashboard_client.fetch("/api/settings")
+            if raw_settings is not None:
+                settings = RuntimeSettings.from_raw(raw_settings)
+                if settings != self.runtime_settings:
+                    self.runtime_settings = settings
+                    logger.info(f"Đã cập nhật cài đặt từ dashboard (phiên bản {settings.version})")
+        except Exception as e:
+            logger.warning(f"Không thể đồng bộ cài đặt từ dashboard: {e}")
+    
     async def on_ready(self):
-        logger.info(f'{self.user} đã đăng nhập và sẵn sàng!')
+        logger.info(f'{self.user} đã đăng nhập và sẵn sàng! (shards: {self.shard_ids or self.shard_count})')
+        # Commands are global, so only the worker owning shard 0 syncs them
+        if self.shard_ids and 0 not in self.shard_ids:
+            return
         try:
             synced = await self.tree.sync()
             logger.info(f'Đã đồng bộ {len(synced)} slash command(s)')
         except Exception as e:
             logger.error(f'Lỗi khi đồng bộ commands: {e}')
     
+    async def close(self):
+        for task in self._background_tasks:
+            task.cancel()
+        await self.work_queue.close()
+        await self.rescanner.close()
+        if self.retention:
+            self.retention.close()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        if self.dashboard_client:
+            await self.dashboard_client.close()
+        await self.enforcement.close()
+        if self.violation_log_writer:
+            await self.violation_log_writer.close()
+        await self.moderation_service.close()
+        await super().close()
+    
     async def on_message(self, message):
-        # Ignore bot messages
-        if message.author.bot:
+        # Ignore bot messages and DMs
+        if message.author.bot or message.guild is None:
             return
         
         # Check if user has admin permissions
         if message.author.guild_permissions.administrator:
             return
         
+        if self.message_window is not None:
+            self.message_window.add(message)
+        
+        # Rate tracking runs inline so floods are caught even while the queues shed
+        mention_count = len(message.raw_mentions) + len(message.raw_role_mentions) + int(message.mention_everyone)
+        flood_result = self.flood_detector.check(
+            message.guild.id, message.author.id, message.content, mention_count
+        )
+        if flood_result:
+            FLOOD_TOTAL.inc(guild=message.guild.id, type=flood_result['violation_type'])
+            self.enforcement.spawn(self.handle_violation(message, flood_result))
+            return
+        
+        # Moderation runs on the worker pool so one busy guild cannot block the others
+        if not self.work_queue.submit(message.guild.id, message):
+            # Queue full: skip the AI but still enforce invite links and keywords
+            logger.warning(f"Hàng đợi của {message.guild.name} đã đầy, chỉ kiểm tra nhanh tin nhắn")
+            violation_result = self.moderation_service.quick_check(message.content)
+            STAGE_TOTAL.inc(guild=message.guild.id, stage=violation_result['stage'])
+            if violation_result['is_violation']:
+                self.enforcement.spawn(self.enforce_verdict(message, violation_result))
+    
+    async def process_message(self, message, degraded: bool = False):
+        """Moderate one queued message; degraded mode skips the AI stage"""
+        started = time.perf_counter()
         try:
-            # Check for violations
-            violation_result = await self.moderation_service.check_message(message.content)
+            # Check for violations (invite links are the first cascade stage)
+            violation_result = await self.moderation_service.check_message(
+                message.content, use_ai=self.runtime_settings.ai_moderation and not degraded
+            )
+            STAGE_TOTAL.inc(guild=message.guild.id, stage=violation_result['stage'])
             
             if violation_result['is_violation']:
-                await self.handle_violation(message, violation_result)
-            
-            # Check for Discord invite links
-            if self.moderation_service.has_discord_invite(message.content):
-                await self.handle_discord_invite(message)
+                await self.enforce_verdict(message, violation_result)
                 
         except Exception as e:
             logger.error(f'Lỗi khi kiểm tra tin nhắn: {e}')
+        finally:
+            MESSAGE_SECONDS.observe(time.perf_counter() - started, guild=message.guild.id)
+    
+    async def enforce_verdict(self, message, violation_result):
+        """Act on a violation verdict (invite links have their own handler)"""
+        if violation_result['violation_type'] == INVITE_VIOLATION_TYPE:
+            await self.handle_discord_invite(message)
+        else:
+            await self.handle_violation(message, violation_result)
     
     async def handle_violation(self, message, violation_result):
         """Handle message violation by deleting and muting user"""
         try:
-            # Delete the message
-            await message.delete()
-            
-            # Mute the user for 10 minutes
-            mute_duration = timedelta(minutes=10)
-            await message.author.timeout(mute_duration, reason=f"Vi phạm: {violation_result['violation_type']}")
+            violation_type = violation_result['violation_type']
+            mute_minutes = self.runtime_settings.mute_duration
             
-            # Log the violation
-            self.violation_db.add_violation(
-                user_id=message.author.id,
-                username=str(message.author),
-                violation_type=violation_result['violation_type'],
-                message_content=message.content,
-                channel_id=message.channel.id,
-                guild_id=message.guild.id
+            # Notification for the user
+            embed = discord.Embed(
+                title="⚠️ Cảnh báo vi phạm",
+                description=f"Tin nhắn của bạn đã bị xóa do vi phạm quy định: **{violation_type}**",
+                color=discord.Color.red(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(
+                name="Thời gian mute",
+                value=format_duration(mute_minutes * 60),
+                inline=True
+            )
+            embed.add_field(
+                name="Lý do",
+                value=violation_result.get('reason', 'Nội dung không phù hợp'),
+                inline=False
             )
             
-            # Send notification to user
-            try:
-                embed = discord.Embed(
-                    title="⚠️ Cảnh báo vi phạm",
-                    description=f"Tin nhắn của bạn đã bị xóa do vi phạm quy định: **{violation_result['violation_type']}**",
-                    color=discord.Color.red(),
-                    timestamp=datetime.utcnow()
-                )
-                embed.add_field(
-                    name="Thời gian mute",
-                    value="10 phút",
-                    inline=True
-                )
-                embed.add_field(
-                    name="Lý do",
-                    value=violation_result.get('reason', 'Nội dung không phù hợp'),
-                    inline=False
-                )
-                await message.author.send(embed=embed)
-            except discord.Forbidden:
-                logger.warning(f"Không thể gửi DM cho {message.author}")
+            # Delete and mute concurrently; logging and the DM happen in the background
+            await self.enforcement.enforce(
+                critical=[
+                    ("delete", f"channel:{message.channel.id}", message.delete),
+                    ("timeout", f"guild:{message.guild.id}", lambda: message.author.timeout(
+                        timedelta(minutes=mute_minutes), reason=f"Vi phạm: {violation_type}"
+                    )),
+                ],
+                background=[
+                    ("log", None, lambda: self.log_violation(message, violation_type, violation_result)),
+                    ("dm", "dm", lambda: message.author.send(embed=embed)),
+                ]
+            )
             
             logger.info(f"Đã xử lý vi phạm từ {message.author} trong {message.guild.name}")
             
@@ -108,44 +328,51 @@ class ModerationBot(commands.Bot):
     async def handle_discord_invite(self, message):
         """Handle Discord invite links"""
         try:
-            # Delete the message
-            await message.delete()
+            mute_minutes = self.runtime_settings.invite_mute_duration
             
-            # Mute user for 5 minutes
-            mute_duration = timedelta(minutes=5)
-            await message.author.timeout(mute_duration, reason="Chia sẻ link Discord không được phép")
+            # Notification for the user
+            embed = discord.Embed(
+                title="🔗 Link không được phép",
+                description="Tin nhắn chứa link Discord invite đã bị xóa",
+                color=discord.Color.orange(),
+                timestamp=datetime.utcnow()
+            )
             
-            # Log the violation
-            self.violation_db.add_violation(
-                user_id=message.author.id,
-                username=str(message.author),
-                violation_type="Discord Invite Link",
-                message_content=message.content,
-                channel_id=message.channel.id,
-                guild_id=message.guild.id
+            await self.enforcement.enforce(
+                critical=[
+                    ("delete", f"channel:{message.channel.id}", message.delete),
+                    ("timeout", f"guild:{message.guild.id}", lambda: message.author.timeout(
+                        timedelta(minutes=mute_minutes), reason="Chia sẻ link Discord không được phép"
+                    )),
+                ],
+                background=[
+                    ("log", None, lambda: self.log_violation(message, INVITE_VIOLATION_TYPE)),
+                    ("dm", "dm", lambda: message.author.send(embed=embed)),
+                ]
             )
             
-            # Send notification
-            try:
-                embed = discord.Embed(
-                    title="🔗 Link không được phép",
-                    description="Tin nhắn chứa link Discord invite đã bị xóa",
-                    color=discord.Color.orange(),
-                    timestamp=datetime.utcnow()
-                )
-                await message.author.send(embed=embed)
-            except discord.Forbidden:
-                pass
-                
             logger.info(f"Đã xóa Discord invite từ {message.author}")
             
         except Exception as e:
             logger.error(f"Lỗi khi xử lý Discord invite: {e}")
+    
+    async def log_violation(self, message, violation_type, violation_result=None):
+        """Record a violation in the bot database and the dashboard mirror"""
+        with DATABASE_SECONDS.time(operation="add_violation"):
+            await self.loop.run_in_executor(None, lambda: self.violation_db.add_violation(
+                user_id=message.author.id,
+                username=str(message.author),
+                violation_type=violation_type,
+                message_content=message.content,
+                channel_id=message.channel.id,
+                guild_id=message.guild.id
+            ))
+        if self.violation_log_writer:
+            await self.violation_log_writer.submit(build_log_record(
+                message, violation_type, "delete, mute", violation_result
+            ))
 
-# Create bot instance
-bot = ModerationBot()
-
-@bot.tree.command(name="report", description="Xem báo cáo vi phạm trong 1 tuần qua (chỉ dành cho admin)")
+@discord.app_commands.command(name="report", description="Xem báo cáo vi phạm trong 1 tuần qua (chỉ dành cho admin)")
 async def report_command(interaction: discord.Interaction):
     # Check if user is admin
     if not interaction.user.guild_permissions.administrator:
@@ -153,10 +380,11 @@ async def report_command(interaction: discord.Interaction):
         return
     
     try:
-        # Get violations from the past week
-        violations = bot.violation_db.get_violations_last_week(interaction.guild.id)
+        # Get violation statistics from the past week
+        with DATABASE_SECONDS.time(operation="get_violation_stats"):
+            stats = interaction.client.violation_db.get_violation_stats(interaction.guild.id, days=7)
         
-        if not violations:
+        if not stats['total_violations']:
             embed = discord.Embed(
                 title="📊 Báo cáo vi phạm (7 ngày qua)",
                 description="Không có vi phạm nào trong tuần qua.",
@@ -169,28 +397,13 @@ async def report_command(interaction: discord.Interaction):
         # Create report embed
         embed = discord.Embed(
             title="📊 Báo cáo vi phạm (7 ngày qua)",
-            description=f"Tổng cộng: **{len(violations)}** vi phạm",
+            description=f"Tổng cộng: **{stats['total_violations']}** vi phạm",
             color=discord.Color.red(),
             timestamp=datetime.utcnow()
         )
         
-        # Group violations by type
-        violation_types = {}
-        user_violations = {}
-        
-        for violation in violations:
-            v_type = violation['violation_type']
-            user_id = violation['user_id']
-            username = violation['username']
-            
-            violation_types[v_type] = violation_types.get(v_type, 0) + 1
-            
-            if user_id not in user_violations:
-                user_violations[user_id] = {'username': username, 'count': 0}
-            user_violations[user_id]['count'] += 1
-        
         # Add violation types field
-        types_text = '\n'.join([f"• {vtype}: {count}" for vtype, count in violation_types.items()])
+        types_text = '\n'.join([f"• {vtype}: {count}" for vtype, count in stats['violation_types'].items()])
         embed.add_field(
             name="📋 Loại vi phạm",
             value=types_text if types_text else "Không có",
@@ -198,7 +411,7 @@ async def report_command(interaction: discord.Interaction):
         )
         
         # Add top violators field
-        top_violators = sorted(user_violations.items(), key=lambda x: x[1]['count'], reverse=True)[:5]
+        top_violators = list(stats['top_violators'].items())[:5]
         violators_text = '\n'.join([
             f"• {data['username']}: {data['count']} lần"
             for user_id, data in top_violators
@@ -217,14 +430,15 @@ async def report_command(interaction: discord.Interaction):
         logger.error(f"Lỗi khi tạo báo cáo: {e}")
         await interaction.response.send_message("❌ Có lỗi xảy ra khi tạo báo cáo!", ephemeral=True)
 
-@bot.tree.command(name="clear_violations", description="Xóa tất cả dữ liệu vi phạm (chỉ dành cho admin)")
+@discord.app_commands.command(name="clear_violations", description="Xóa tất cả dữ liệu vi phạm (chỉ dành cho admin)")
 async def clear_violations_command(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message("❌ Bạn không có quyền sử dụng lệnh này!", ephemeral=True)
         return
     
     try:
-        bot.violation_db.clear_violations(interaction.guild.id)
+        with DATABASE_SECONDS.time(operation="clear_violations"):
+            interaction.client.violation_db.clear_violations(interaction.guild.id)
         embed = discord.Embed(
             title="🗑️ Đã xóa dữ liệu",
             description="Tất cả dữ liệu vi phạm đã được xóa.",
@@ -236,6 +450,72 @@ async def clear_violations_command(interaction: discord.Interaction):
         logger.error(f"Lỗi khi xóa violations: {e}")
         await interaction.response.send_message("❌ Có lỗi xảy ra!", ephemeral=True)
 
+@discord.app_commands.command(name="queue_status", description="Xem tình trạng hàng đợi kiểm duyệt (chỉ dành cho admin)")
+async def queue_status_command(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Bạn không có quyền sử dụng lệnh này!", ephemeral=True)
+        return
+    
+    stats = interaction.client.work_queue.get_stats(interaction.guild.id)
+    guild_stats = stats['guild']
+    embed = discord.Embed(
+        title="📥 Hàng đợi kiểm duyệt",
+        color=discord.Color.blue(),
+        timestamp=datetime.utcnow()
+    )
+    embed.add_field(
+        name="Server này",
+        value=(
+            f"• Đang chờ: {guild_stats['depth']}\n"
+            f"• Thời gian chờ TB: {guild_stats['avg_wait'] * 1000:.0f} ms\n"
+            f"• Thời gian chờ tối đa: {guild_stats['max_wait'] * 1000:.0f} ms\n"
+            f"• Chế độ giảm tải: {guild_stats['degraded']} tin nhắn\n"
+            f"• Bị bỏ qua: {guild_stats['shed']} tin nhắn"
+        ),
+        inline=True
+    )
+    embed.add_field(
+        name="Toàn bộ bot",
+        value=(
+            f"• Đang chờ: {stats['depth']} ({stats['active_guilds']} server)\n"
+            f"• Workers: {stats['workers']}\n"
+            f"• Đã xử lý: {stats['processed']}\n"
+            f"• Bị bỏ qua: {stats['shed']}"
+        ),
+        inline=True
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@discord.app_commands.command(name="profile", description="Lấy profile CPU hoặc bộ nhớ của bot (chỉ dành cho admin)")
+@discord.app_commands.describe(mode="cpu: collapsed stacks cho flame graph, memory: chênh lệch tracemalloc", seconds="Thời gian lấy mẫu (giây)")
+@discord.app_commands.choices(mode=[
+    discord.app_commands.Choice(name="cpu", value="cpu"),
+    discord.app_commands.Choice(name="memory", value="memory"),
+])
+async def profile_command(interaction: discord.Interaction, mode: str = "cpu", seconds: int = 10):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Bạn không có quyền sử dụng lệnh này!", ephemeral=True)
+        return
+    
+    seconds = max(1, min(seconds, int(Config.PROFILER_MAX_SECONDS)))
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        if mode == "memory":
+            body = await memory_diff(seconds)
+            filename = f"memory-{datetime.utcnow():%Y%m%d-%H%M%S}.txt"
+        else:
+            body = await profile_event_loop(seconds)
+            filename = f"profile-{datetime.utcnow():%Y%m%d-%H%M%S}.collapsed"
+    except ProfilerBusy:
+        await interaction.followup.send("⏳ Đang có một phiên profile khác, vui lòng thử lại sau.", ephemeral=True)
+        return
+    
+    await interaction.followup.send(
+        f"✅ Profile {mode} trong {seconds} giây",
+        file=discord.File(io.BytesIO(body.encode("utf-8")), filename=filename),
+        ephemeral=True
+    )
+
 if __name__ == "__main__":
     # Get bot token from environment
     token = os.getenv("DISCORD_BOT_TOKEN")
@@ -243,6 +523,11 @@ if __name__ == "__main__":
         logger.error("DISCORD_BOT_TOKEN không được tìm thấy trong environment variables!")
         exit(1)
     
+    # Create bot instance
+    bot = ModerationBot()
+    for command in (report_command, clear_violations_command, queue_status_command, profile_command):
+        bot.tree.add_command(command)
+    
     try:
         bot.run(token)
     except Exception as e:
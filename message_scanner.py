@@ -0,0 +1,89 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+from config import Config
+
+# Invite hosts from the config plus the vanity domains discord.(io|me|li)
+_INVITE_HOSTS = [re.escape(pattern.rstrip("/")) for pattern in Config.DISCORD_INVITE_PATTERNS]
+_INVITE_HOSTS += [r"discord\.(?:io|me|li)"]
+
+# One alternation walked left to right; the first branch that matches at a
+# position wins, so invites are recognised before generic URLs and runs
+# are only counted outside of links, mentions and emoji. Hosts match in any
+# case; the run branch is scoped back to case-sensitive, single-line
+# matching so "aAaAa" or blank lines are not runs, as in the old (.)\1{4,}
+MESSAGE_PATTERN = re.compile(
+    r"(?P<invite>(?:https?://)?(?:www\.)?(?:" + "|".join(_INVITE_HOSTS) + r")/(?P<code>[\w-]+))"
+    r"|(?P<url>https?://[^\s<>]+)"
+    r"|(?P<user><@!?\d+>)"
+    r"|(?P<role><@&\d+>)"
+    r"|(?P<channel><#\d+>)"
+    r"|(?P<emoji><a?:\w+:\d+>|[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF])"
+    r"|(?P<run>(?-is:(?P<char>.)(?P=char){2,}))",
+    re.IGNORECASE | re.DOTALL
+)
+
+class MessageFeatures(NamedTuple):
+    """Structural features of one message, produced by a single regex pass"""
+    length: int
+    invite_codes: Tuple[str, ...]
+    urls: Tuple[str, ...]
+    user_mentions: int
+    role_mentions: int
+    channel_mentions: int
+    emoji_count: int
+    # Longest run of one repeated character; runs shorter than 3 report as 1
+    longest_run: int
+    caps_ratio: float
+    all_caps: bool
+    # (kind, start, end) for every invite, url, mention and emoji
+    spans: Tuple[Tuple[str, int, int], ...]
+
+    @property
+    def has_invite(self) -> bool:
+        return bool(self.invite_codes)
+
+    @property
+    def mention_count(self) -> int:
+        """User and role mentions"""
+        return self.user_mentions + self.role_mentions
+
+@lru_cache(maxsize=4096)
+def scan_message(content: str) -> MessageFeatures:
+    """Walk a message once and return its structural features"""
+    invite_codes = []
+    urls = []
+    spans = []
+    counts = {"user": 0, "role": 0, "channel": 0, "emoji": 0}
+    longest_run = 1 if content else 0
+
+    for match in MESSAGE_PATTERN.finditer(content):
+        kind = match.lastgroup
+        if kind == "run":
+            longest_run = max(longest_run, match.end() - match.start())
+            continue
+        if kind == "invite":
+            invite_codes.append(match.group("code"))
+            if match.group().lower().startswith("http"):
+                urls.append(match.group())
+        elif kind == "url":
+            urls.append(match.group())
+        else:
+            counts[kind] += 1
+        spans.append((kind, match.start(), match.end()))
+
+    letters = sum(map(str.isalpha, content))
+    uppercase = sum(map(str.isupper, content))
+    return MessageFeatures(
+        length=len(content),
+        invite_codes=tuple(invite_codes),
+        urls=tuple(urls),
+        user_mentions=counts["user"],
+        role_mentions=counts["role"],
+        channel_mentions=counts["channel"],
+        emoji_count=counts["emoji"],
+        longest_run=longest_run,
+        caps_ratio=uppercase / letters if letters else 0.0,
+        all_caps=content.isupper(),
+        spans=tuple(spans)
+    )
@@ -0,0 +1,241 @@
+import json
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers keyword scans (sub-millisecond) up to slow AI round trips
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted raw samples (benchmarks and replays)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._series.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}"]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(zip(self.labels, key)), "value": value} for key, value in self._series.items()]
+
+class Counter(_Metric):
+    """Monotonic counter"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._series[key] = self._series.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback"""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Dict[str, Any], float]]]] = None):
+        super().__init__(name, description, labels)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        self._series[self._key(labels)] = value
+
+    def _collect(self):
+        if self.callback is None:
+            return
+        try:
+            self._series = {self._key(labels): value for labels, value in self.callback()}
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} callback failed: {e}")
+
+    def render(self) -> List[str]:
+        self._collect()
+        return super().render()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        self._collect()
+        return super().snapshot()
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; quantiles are interpolated within buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.bounds = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # The last slot counts observations above the highest bound
+            series = self._series[key] = _HistogramSeries(len(self.bounds) + 1)
+        series.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def quantile(self, series: _HistogramSeries, q: float) -> float:
+        if not series.count:
+            return 0.0
+        rank = q * series.count
+        cumulative = 0
+        for index, count in enumerate(series.buckets):
+            if cumulative + count >= rank and count:
+                lower = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return lower
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def _render_series(self, key, series: _HistogramSeries) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, series.buckets):
+            cumulative += count
+            bucket_labels = _format_labels(self.labels, key, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        bucket_labels = _format_labels(self.labels, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{bucket_labels} {series.count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series.sum}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series.count}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "labels": dict(zip(self.labels, key)),
+                "count": series.count,
+                "sum": series.sum,
+                "p50": self.quantile(series, 0.50),
+                "p95": self.quantile(series, 0.95),
+                "p99": self.quantile(series, 0.99),
+            }
+            for key, series in self._series.items()
+        ]
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, description, labels, callback))
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view with quantiles precomputed, used by the dashboard"""
+        return {
+            name: {"type": metric.kind, "series": metric.snapshot()}
+            for name, metric in self._metrics.items()
+        }
+
+REGISTRY = MetricsRegistry()
+
+MESSAGE_SECONDS = REGISTRY.histogram(
+    "moderation_message_seconds", "Time to moderate one message, excluding queue wait", ["guild"])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "moderation_queue_wait_seconds", "Time a message waited in its guild queue", ["guild"])
+STAGE_TOTAL = REGISTRY.counter(
+    "moderation_stage_total", "Messages resolved per cascade stage", ["guild", "stage"])
+CHECK_SECONDS = REGISTRY.histogram(
+    "moderation_check_seconds", "check_message latency by resolving stage", ["stage"])
+AI_REQUEST_SECONDS = REGISTRY.histogram(
+    "moderation_ai_request_seconds", "AI chat-completion round trips", ["outcome"])
+ENFORCEMENT_SECONDS = REGISTRY.histogram(
+    "moderation_enforcement_seconds", "Enforcement action latency including retries", ["action", "outcome"])
+DATABASE_SECONDS = REGISTRY.histogram(
+    "moderation_database_seconds", "Violation database reads and writes", ["operation"])
+FLOOD_TOTAL = REGISTRY.counter(
+    "moderation_flood_total", "Flood, mass mention and raid detections", ["guild", "type"])
+SHED_TOTAL = REGISTRY.counter(
+    "moderation_shed_total", "Messages dropped because the guild queue was full", ["guild"])
+
+def metrics_app(registry: MetricsRegistry = REGISTRY) -> web.Application:
+    """aiohttp app serving /metrics (Prometheus) and /metrics/summary (JSON)"""
+    app = web.Application()
+
+    async def prometheus(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def summary(request: web.Request) -> web.Response:
+        return web.Response(text=json.dumps(registry.snapshot(), ensure_ascii=False), content_type="application/json")
+
+    app.router.add_get("/metrics", prometheus)
+    app.router.add_get("/metrics/summary", summary)
+    return app
+
+async def start_http_server(app: web.Application, host: str, port: int) -> web.AppRunner:
+    """Serve an aiohttp app from inside the bot's event loop"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
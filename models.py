@@ -15,6 +15,10 @@ class FilterKeyword(db.Model):
 
 class ViolationLog(db.Model):
     __tablename__ = 'violation_logs'
+    __table_args__ = (
+        db.Index('ix_violation_logs_type_timestamp', 'violation_type', 'timestamp'),
+        db.Index('ix_violation_logs_user_timestamp', 'user_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(50), nullable=False)
@@ -26,7 +30,7 @@ class ViolationLog(db.Model):
     detected_keywords = db.Column(db.Text, nullable=True)  # JSON string of detected keywords
     ai_confidence = db.Column(db.Float, nullable=True)
     action_taken = db.Column(db.String(100), nullable=False)  # mute, warn, delete
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class BotSettings(db.Model):
     __tablename__ = 'bot_settings'
@@ -1,139 +1,509 @@
 import json
-import re
+import time
 import asyncio
 import logging
-from typing import Dict, Any, List
-from openai import OpenAI
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+import httpx
+from openai import AsyncOpenAI
 from config import Config
+from keyword_matcher import KeywordMatcher, KeywordMatch
+from message_scanner import scan_message
+from metrics import CHECK_SECONDS, AI_REQUEST_SECONDS
+from ai_batcher import AIBatcher
+from verdict_cache import VerdictCache, prompt_fingerprint
+from local_classifier import LocalClassifier
+from flood_detector import FLOOD_VIOLATION_TYPE, MASS_MENTION_VIOLATION_TYPE, RAID_VIOLATION_TYPE
 
 logger = logging.getLogger(__name__)
 
+AI_SYSTEM_PROMPT = """Bạn là một hệ thống kiểm duyệt nội dung tiếng Việt. 
+                        Phân tích tin nhắn và xác định xem có vi phạm các quy định sau không:
+                        1. Ngôn từ thô tục, chửi bậy
+                        2. Quấy rối, gạ gẫm
+                        3. Xúc phạm, lăng mạ
+                        4. Nội dung không phù hợp khác
+                        
+                        Trả về kết quả JSON với format:
+                        {
+                            "is_violation": boolean,
+                            "violation_type": "string (nếu vi phạm)",
+                            "confidence": number (0-1),
+                            "reason": "string giải thích"
+                        }"""
+
+AI_BATCH_INSTRUCTIONS = """
+                        
+                        Khi nhận được một danh sách tin nhắn dạng [{"id": number, "text": string}],
+                        đánh giá từng tin nhắn độc lập và trả về JSON với format:
+                        {
+                            "results": [
+                                {"id": number, "is_violation": boolean, "violation_type": "string",
+                                 "confidence": number (0-1), "reason": "string"}
+                            ]
+                        }"""
+
+INVITE_VIOLATION_TYPE = "Discord Invite Link"
+
 class ModerationService:
     def __init__(self):
         self.config = Config()
         self.openai_client = None
+        self.ai_batcher = None
+        
+        # Keyword automaton, built once and swapped when keywords change
+        self.keyword_matcher = KeywordMatcher.build(self.config)
+        
+        # Optional n-gram classifier; None when no model is trained or NumPy is missing
+        self.local_classifier = LocalClassifier.load(self.config.LOCAL_CLASSIFIER_PATH)
+        
+        # Messages resolved per cascade stage
+        self.stage_counts = Counter()
+        
+        # AI verdicts for repeated messages, invalidated on prompt/model change
+        self.ai_prompt = AI_SYSTEM_PROMPT
+        self.verdict_cache = VerdictCache(
+            max_size=self.config.AI_CACHE_MAX_SIZE,
+            ttl_seconds=self.config.AI_CACHE_TTL_SECONDS
+        )
+        self._ai_inflight: Dict[str, asyncio.Future] = {}
+        
+        # Bounds the number of in-flight AI requests across all guilds
+        self.ai_semaphore = asyncio.Semaphore(self.config.AI_MAX_CONCURRENCY)
         
         # Initialize OpenAI if API key is available
         if self.config.OPENAI_API_KEY:
             try:
-                self.openai_client = OpenAI(api_key=self.config.OPENAI_API_KEY)
+                # One pooled async HTTP client, reused for every request
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.config.AI_MAX_CONCURRENCY,
+                        max_keepalive_connections=self.config.AI_MAX_CONCURRENCY
+                    ),
+                    timeout=self.config.AI_REQUEST_TIMEOUT_SECONDS
+                )
+                self.openai_client = AsyncOpenAI(
+                    api_key=self.config.OPENAI_API_KEY,
+                    base_url=self.config.OPENAI_BASE_URL,
+                    timeout=self.config.AI_REQUEST_TIMEOUT_SECONDS,
+                    max_retries=self.config.AI_MAX_RETRIES,
+                    http_client=http_client
+                )
                 logger.info("OpenAI client initialized successfully")
+                
+                if self.config.AI_BATCH_SIZE > 1:
+                    self.ai_batcher = AIBatcher(
+                        self._request_ai_batch,
+                        max_batch_size=self.config.AI_BATCH_SIZE,
+                        max_wait_seconds=self.config.AI_BATCH_MAX_WAIT_MS / 1000.0
+                    )
             except Exception as e:
                 logger.warning(f"Could not initialize OpenAI client: {e}")
                 self.openai_client = None
         else:
             logger.warning("OpenAI API key not found, using keyword-based filtering only")
     
-    async def check_message(self, content: str) -> Dict[str, Any]:
+    async def close(self):
+        """Close the pooled AI HTTP connections"""
+        if self.openai_client:
+            await self.openai_client.close()
+    
+    async def check_message(self, content: str, use_ai: bool = True) -> Dict[str, Any]:
         """
         Check if a message violates community guidelines
         Returns a dictionary with violation information
+        
+        Cheap local stages run first; messages they cannot settle (including
+        those with no keyword hit, see AI_NO_HIT_CONFIDENCE) are escalated
+        to the AI.
+        """
+        started = time.perf_counter()
+        result = await self._run_cascade(content, use_ai)
+        CHECK_SECONDS.observe(time.perf_counter() - started, stage=result["stage"])
+        return result
+    
+    async def _run_cascade(self, content: str, use_ai: bool) -> Dict[str, Any]:
+        stage, result, confidence, spam_signal = self._screen(content)
+        if stage:
+            return self._resolve(stage, result)
+        
+        # Stage 4: local classifier settles confident cases without the AI
+        if self.local_classifier:
+            verdict = self.local_classifier.predict(content)
+            classifier_result = self._classifier_result(verdict, result, spam_signal)
+            if classifier_result is not None:
+                return self._resolve("classifier", classifier_result)
+            confidence = max(confidence, verdict.confidence)
+        
+        if confidence < self.config.AI_ESCALATION_MIN_CONFIDENCE or not self.openai_client or not use_ai:
+            return self._resolve("local", result)
+        
+        # Stage 5: AI for the ambiguous middle band
+        try:
+            return self._resolve("ai", await self.check_with_ai(content))
+        except Exception as e:
+            logger.warning(f"AI moderation failed, falling back to keyword filtering: {e}")
+            return self._resolve("ai_fallback", result)
+    
+    def quick_check(self, content: str) -> Dict[str, Any]:
+        """
+        Only the cheap stages (invite links and decisive keywords), for
+        messages that cannot wait for the queue; undecided messages pass
+        """
+        stage, result, _, _ = self._screen(content)
+        return self._resolve(stage or "shed", result if stage else {"is_violation": False})
+    
+    def _screen(self, content: str) -> Tuple[Optional[str], Dict[str, Any], float, bool]:
+        """
+        Run the cheap stages. Returns (stage, result, confidence, spam_signal);
+        stage is None when the message is still undecided, in which case
+        result is the keyword verdict used as the local fallback.
         """
         if not content or len(content.strip()) == 0:
-            return {"is_violation": False}
+            return "empty", {"is_violation": False}, 0.0, False
         
-        # First, try OpenAI-based analysis if available
-        if self.openai_client:
+        # Stage 1: Discord invite links
+        if self.has_discord_invite(content):
+            return "invite", {
+                "is_violation": True,
+                "violation_type": INVITE_VIOLATION_TYPE,
+                "confidence": 1.0,
+                "reason": "Chứa link Discord invite"
+            }, 1.0, False
+        
+        # Stage 2: keyword filtering
+        local_result = self.check_with_keywords(content)
+        confidence = local_result.get("confidence", 0.0)
+        if local_result["is_violation"] and confidence >= self.config.LOCAL_DECISIVE_CONFIDENCE:
+            return "keywords", local_result, confidence, False
+        
+        # Stage 3: spam heuristics only raise suspicion, they never decide alone
+        spam_signal = self.is_potential_spam(content)
+        if spam_signal:
+            confidence = max(confidence, self.config.SPAM_SIGNAL_CONFIDENCE)
+        
+        # No keyword hit is no evidence of a clean message; only the classifier can clear it
+        if not local_result["is_violation"]:
+            confidence = max(confidence, self.config.AI_NO_HIT_CONFIDENCE)
+        return None, local_result, confidence, spam_signal
+    
+    async def check_messages(self, contents: Iterable[str], use_ai: bool = True,
+                             chunk_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Moderate many messages, yielding one result per input in input order.
+        
+        Works through the input in chunks: identical texts are judged once,
+        the local classifier scores each chunk in one vectorized call and
+        messages that still need the AI are sent in groups of AI_BATCH_SIZE.
+        Any iterable works, including a lazy stream over a database. The next
+        chunk is screened while the previous one waits on the AI.
+        """
+        in_flight: Deque[asyncio.Task] = deque()
+        chunk = []
+        try:
+            for content in contents:
+                chunk.append(content)
+                if len(chunk) >= chunk_size:
+                    in_flight.append(asyncio.ensure_future(self._check_chunk(chunk, use_ai)))
+                    chunk = []
+                    if len(in_flight) >= 2:
+                        for result in await in_flight.popleft():
+                            yield result
+            if chunk:
+                in_flight.append(asyncio.ensure_future(self._check_chunk(chunk, use_ai)))
+            while in_flight:
+                for result in await in_flight.popleft():
+                    yield result
+        finally:
+            # The caller stopped early; drop work nobody will read
+            for task in in_flight:
+                task.cancel()
+    
+    async def _check_chunk(self, chunk: List[str], use_ai: bool) -> List[Dict[str, Any]]:
+        decided: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        undecided = []
+        for content in dict.fromkeys(chunk):
+            stage, result, confidence, spam_signal = self._screen(content)
+            if stage:
+                decided[content] = (stage, result)
+            else:
+                undecided.append((content, result, confidence, spam_signal))
+        
+        if undecided and self.local_classifier:
+            verdicts = self.local_classifier.predict_many([content for content, _, _, _ in undecided])
+            remaining = []
+            for (content, result, confidence, spam_signal), verdict in zip(undecided, verdicts):
+                classifier_result = self._classifier_result(verdict, result, spam_signal)
+                if classifier_result is not None:
+                    decided[content] = ("classifier", classifier_result)
+                else:
+                    remaining.append((content, result, max(confidence, verdict.confidence), spam_signal))
+            undecided = remaining
+        
+        escalate = []
+        for content, result, confidence, _ in undecided:
+            if confidence < self.config.AI_ESCALATION_MIN_CONFIDENCE or not self.openai_client or not use_ai:
+                decided[content] = ("local", result)
+            else:
+                escalate.append((content, result))
+        if escalate:
+            decided.update(await self._check_group_with_ai(escalate))
+        else:
+            # Let live traffic run between CPU-bound chunks
+            await asyncio.sleep(0)
+        
+        return [self._resolve(decided[content][0], dict(decided[content][1])) for content in chunk]
+    
+    async def _check_group_with_ai(self, escalate: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """AI verdicts for many messages: cache hits first, then grouped requests"""
+        self.verdict_cache.ensure_fingerprint(
+            prompt_fingerprint(self.config.OPENAI_MODEL, self.ai_prompt + AI_BATCH_INSTRUCTIONS)
+        )
+        decided = {}
+        uncached = []
+        for content, local_result in escalate:
+            cached = self.verdict_cache.get(content)
+            if cached is not None:
+                decided[content] = ("ai", cached)
+            else:
+                uncached.append((content, local_result))
+        
+        async def request(group):
             try:
-                ai_result = await self.check_with_ai(content)
-                if ai_result["is_violation"]:
-                    return ai_result
+                verdicts = await self._request_ai_batch([content for content, _ in group])
             except Exception as e:
-                logger.warning(f"AI moderation failed, falling back to keyword filtering: {e}")
+                logger.warning(f"AI moderation failed for a group of {len(group)}, falling back to keyword filtering: {e}")
+                for content, local_result in group:
+                    decided[content] = ("ai_fallback", local_result)
+                return
+            for (content, local_result), verdict in zip(group, verdicts):
+                if isinstance(verdict, Exception):
+                    decided[content] = ("ai_fallback", local_result)
+                else:
+                    self.verdict_cache.put(content, verdict)
+                    decided[content] = ("ai", verdict)
         
-        # Fallback to keyword-based filtering
-        return self.check_with_keywords(content)
+        group_size = max(1, self.config.AI_BATCH_SIZE)
+        # The AI semaphore bounds how many of these groups are in flight at once
+        await asyncio.gather(*(request(uncached[i:i + group_size]) for i in range(0, len(uncached), group_size)))
+        return decided
+    
+    def _classifier_result(self, verdict, local_result: Dict[str, Any], spam_signal: bool):
+        """Final result from a classifier verdict, or None when it is not confident enough"""
+        if verdict.confidence >= self.config.LOCAL_CLASSIFIER_VIOLATION_CONFIDENCE:
+            return {
+                "is_violation": True,
+                "violation_type": local_result.get("violation_type") or verdict.violation_type,
+                "confidence": verdict.confidence,
+                "reason": f"Bộ phân loại cục bộ: {verdict.violation_type}"
+            }
+        # Keyword hits and spam signals are never overruled by a clean verdict
+        if (verdict.confidence <= self.config.LOCAL_CLASSIFIER_CLEAN_CONFIDENCE
+                and not local_result["is_violation"] and not spam_signal):
+            return dict(local_result, confidence=verdict.confidence)
+        return None
+    
+    def _resolve(self, stage: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record which stage decided the message and tag the result with it"""
+        self.stage_counts[stage] += 1
+        result["stage"] = stage
+        return result
+    
+    def get_stage_stats(self) -> Dict[str, Any]:
+        """Per-stage counts and the fraction of traffic each stage resolved"""
+        total = sum(self.stage_counts.values())
+        return {
+            "total": total,
+            "stages": {
+                stage: {"count": count, "fraction": round(count / total, 4) if total else 0.0}
+                for stage, count in self.stage_counts.items()
+            }
+        }
     
     async def check_with_ai(self, content: str) -> Dict[str, Any]:
         """Use OpenAI to analyze message content for violations"""
+        self.verdict_cache.ensure_fingerprint(
+            prompt_fingerprint(self.config.OPENAI_MODEL, self.ai_prompt + AI_BATCH_INSTRUCTIONS)
+        )
+        cached = self.verdict_cache.get(content)
+        if cached is not None:
+            return cached
+        
+        # Identical messages already waiting on the AI share that request
+        key = self.verdict_cache.make_key(content)
+        pending = self._ai_inflight.get(key)
+        if pending is not None:
+            return dict(await asyncio.shield(pending))
+        
+        pending = asyncio.get_running_loop().create_future()
+        self._ai_inflight[key] = pending
         try:
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Bạn là một hệ thống kiểm duyệt nội dung tiếng Việt. 
-                        Phân tích tin nhắn và xác định xem có vi phạm các quy định sau không:
-                        1. Ngôn từ thô tục, chửi bậy
-                        2. Quấy rối, gạ gẫm
-                        3. Xúc phạm, lăng mạ
-                        4. Nội dung không phù hợp khác
-                        
-                        Trả về kết quả JSON với format:
-                        {
-                            "is_violation": boolean,
-                            "violation_type": "string (nếu vi phạm)",
-                            "confidence": number (0-1),
-                            "reason": "string giải thích"
-                        }"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Phân tích tin nhắn này: {content}"
-                    }
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=200
-            )
+            if self.ai_batcher:
+                verdict = await self.ai_batcher.submit(content)
+            else:
+                verdict = await self._request_ai_verdict(content)
+            self.verdict_cache.put(content, verdict)
+            pending.set_result(verdict)
+            return dict(verdict)
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark retrieved so an unawaited failure is not reported by asyncio
+            pending.exception()
+            raise
+        finally:
+            self._ai_inflight.pop(key, None)
+            if not pending.done():
+                # The owner was cancelled; fail the waiters (they fall back) instead of leaving them hanging
+                pending.set_exception(RuntimeError("AI request was cancelled"))
+                pending.exception()
+    
+    async def _request_ai_batch(self, contents: List[str]) -> List[Any]:
+        """
+        Classify several messages with one AI request. Messages the response
+        has no verdict for get a ValueError in their slot instead of a verdict,
+        so only those fall back.
+        """
+        if len(contents) == 1:
+            return [await self._request_ai_verdict(contents[0])]
+        
+        items = [{"id": index, "text": content} for index, content in enumerate(contents)]
+        result = await self._request_completion(
+            self.ai_prompt + AI_BATCH_INSTRUCTIONS,
+            f"Phân tích các tin nhắn sau: {json.dumps(items, ensure_ascii=False)}",
+            max_tokens=200 * len(contents)
+        )
+        
+        verdicts = {}
+        for entry in result.get("results", []):
+            if not isinstance(entry, dict):
+                continue
+            # Models sometimes echo the ids back as strings ("0")
+            try:
+                verdicts[int(entry.get("id"))] = entry
+            except (TypeError, ValueError):
+                continue
+        missing = [index for index in range(len(contents)) if index not in verdicts]
+        if missing:
+            logger.warning(f"AI batch response missing verdicts for ids {missing}")
+        return [
+            self._normalize_verdict(verdicts[index]) if index in verdicts
+            else ValueError(f"AI batch response has no verdict for id {index}")
+            for index in range(len(contents))
+        ]
+    
+    async def _request_ai_verdict(self, content: str) -> Dict[str, Any]:
+        """Send a single message to the AI and normalize its verdict"""
+        result = await self._request_completion(self.ai_prompt, f"Phân tích tin nhắn này: {content}")
+        return self._normalize_verdict(result)
+    
+    async def _request_completion(self, system_prompt: str, user_content: str, max_tokens: int = 200) -> Dict[str, Any]:
+        """Run one chat completion and parse its JSON body"""
+        started = time.perf_counter()
+        try:
+            async with self.ai_semaphore:
+                response = await asyncio.wait_for(
+                    self.openai_client.chat.completions.create(
+                        model=self.config.OPENAI_MODEL,
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": system_prompt
+                            },
+                            {
+                                "role": "user",
+                                "content": user_content
+                            }
+                        ],
+                        response_format={"type": "json_object"},
+                        max_tokens=max_tokens
+                    ),
+                    timeout=self.config.AI_REQUEST_TIMEOUT_SECONDS
+                )
             
             result = json.loads(response.choices[0].message.content)
-            
-            # Validate and normalize the response
-            return {
-                "is_violation": result.get("is_violation", False),
-                "violation_type": result.get("violation_type", "Unknown"),
-                "confidence": min(1.0, max(0.0, result.get("confidence", 0.5))),
-                "reason": result.get("reason", "Nội dung không phù hợp")
-            }
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+            return result
             
         except Exception as e:
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
             logger.error(f"OpenAI moderation error: {e}")
             raise
     
+    @staticmethod
+    def _normalize_verdict(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and normalize an AI verdict"""
+        return {
+            "is_violation": result.get("is_violation", False),
+            "violation_type": result.get("violation_type", "Unknown"),
+            "confidence": min(1.0, max(0.0, result.get("confidence", 0.5))),
+            "reason": result.get("reason", "Nội dung không phù hợp")
+        }
+    
+    def update_keywords(self, extra_keywords: Dict[str, List] = None):
+        """Rebuild the keyword matcher from Config plus dashboard keywords"""
+        self.set_keyword_matcher(KeywordMatcher.build(self.config, extra_keywords))
+    
+    def set_keyword_matcher(self, matcher: KeywordMatcher):
+        """Swap in a prebuilt matcher; checks already running keep the old one"""
+        self.keyword_matcher = matcher
+    
+    def scan_keywords(self, content: str) -> Dict[str, List[KeywordMatch]]:
+        """Return every keyword hit grouped by category, in one pass over the text"""
+        return self.keyword_matcher.scan_by_category(content)
+    
     def check_with_keywords(self, content: str) -> Dict[str, Any]:
         """Check message using keyword-based filtering"""
-        content_lower = content.lower()
+        hits = self.scan_keywords(content)
+        matched_keywords = [
+            {"keyword": m.keyword, "category": m.category, "start": m.start, "end": m.end}
+            for category_hits in hits.values() for m in category_hits
+        ]
         
         # Check for profanity
-        for word in self.config.PROFANITY_WORDS:
-            if word.lower() in content_lower:
-                return {
-                    "is_violation": True,
-                    "violation_type": "Ngôn từ thô tục",
-                    "confidence": 0.9,
-                    "reason": f"Chứa từ ngữ thô tục: {word}"
-                }
+        if "PROFANITY" in hits:
+            return {
+                "is_violation": True,
+                "violation_type": "Ngôn từ thô tục",
+                "confidence": 0.9,
+                "reason": f"Chứa từ ngữ thô tục: {hits['PROFANITY'][0].keyword}",
+                "matched_keywords": matched_keywords
+            }
         
         # Check for harassment
-        harassment_count = 0
-        found_harassment_words = []
-        for word in self.config.HARASSMENT_KEYWORDS:
-            if word.lower() in content_lower:
-                harassment_count += 1
-                found_harassment_words.append(word)
-        
-        if harassment_count >= 2:  # Multiple harassment keywords
+        found_harassment_words = list(dict.fromkeys(m.keyword for m in hits.get("HARASSMENT", [])))
+        if len(found_harassment_words) >= 2:  # Multiple harassment keywords
             return {
                 "is_violation": True,
                 "violation_type": "Quấy rối, gạ gẫm",
                 "confidence": 0.8,
-                "reason": f"Chứa nội dung gạ gẫm: {', '.join(found_harassment_words)}"
+                "reason": f"Chứa nội dung gạ gẫm: {', '.join(found_harassment_words)}",
+                "matched_keywords": matched_keywords
             }
         
         # Check for offensive content
-        for word in self.config.OFFENSIVE_KEYWORDS:
-            if word.lower() in content_lower:
-                return {
-                    "is_violation": True,
-                    "violation_type": "Nội dung xúc phạm",
-                    "confidence": 0.8,
-                    "reason": f"Chứa nội dung xúc phạm: {word}"
-                }
+        if "OFFENSIVE" in hits:
+            return {
+                "is_violation": True,
+                "violation_type": "Nội dung xúc phạm",
+                "confidence": 0.8,
+                "reason": f"Chứa nội dung xúc phạm: {hits['OFFENSIVE'][0].keyword}",
+                "matched_keywords": matched_keywords
+            }
+        
+        # Check for spam keywords managed from the dashboard
+        if "SPAM" in hits:
+            return {
+                "is_violation": True,
+                "violation_type": "Spam",
+                "confidence": 0.7,
+                "reason": f"Chứa nội dung spam: {hits['SPAM'][0].keyword}",
+                "matched_keywords": matched_keywords
+            }
         
         # Check for excessive caps (shouting)
-        if len(content) > 10 and content.isupper():
+        features = scan_message(content)
+        if features.length > 10 and features.all_caps:
             return {
                 "is_violation": True,
                 "violation_type": "Spam/Shouting",
@@ -141,40 +511,19 @@ class ModerationService:
                 "reason": "Tin nhắn viết hoa toàn bộ (shouting)"
             }
         
-        return {"is_violation": False}
+        # A single harassment keyword is suspicious but not conclusive
+        confidence = self.config.HARASSMENT_SINGLE_HIT_CONFIDENCE if found_harassment_words else 0.0
+        return {"is_violation": False, "confidence": confidence, "matched_keywords": matched_keywords}
     
     def has_discord_invite(self, content: str) -> bool:
         """Check if message contains Discord invite links"""
-        content_lower = content.lower()
-        
-        for pattern in self.config.DISCORD_INVITE_PATTERNS:
-            if pattern in content_lower:
-                return True
-        
-        # Also check for discord invite regex patterns
-        discord_invite_regex = r"(https?://)?(www\.)?(discord\.(gg|io|me|li)|discordapp\.com/invite)/[a-zA-Z0-9]+"
-        if re.search(discord_invite_regex, content, re.IGNORECASE):
-            return True
-        
-        return False
+        return scan_message(content).has_invite
     
     def is_potential_spam(self, content: str) -> bool:
         """Check if message is potential spam"""
-        # Check for repeated characters
-        if re.search(r'(.)\1{4,}', content):  # Same character 5+ times
-            return True
-        
-        # Check for excessive emojis
-        emoji_count = len(re.findall(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]', content))
-        if emoji_count > 10:
-            return True
-        
-        # Check for excessive mentions
-        mention_count = len(re.findall(r'<@[!&]?\d+>', content))
-        if mention_count > 5:
-            return True
-        
-        return False
+        features = scan_message(content)
+        # Same character 5+ times, excessive emojis or excessive mentions
+        return features.longest_run >= 5 or features.emoji_count > 10 or features.mention_count > 5
     
     def get_violation_severity(self, violation_type: str) -> str:
         """Get severity level of violation"""
@@ -182,7 +531,10 @@ class ModerationService:
             "Ngôn từ thô tục": "high",
             "Quấy rối, gạ gẫm": "critical",
             "Nội dung xúc phạm": "high",
-            "Discord Invite Link": "medium",
-            "Spam/Shouting": "low"
+            INVITE_VIOLATION_TYPE: "medium",
+            "Spam/Shouting": "low",
+            FLOOD_VIOLATION_TYPE: "medium",
+            MASS_MENTION_VIOLATION_TYPE: "high",
+            RAID_VIOLATION_TYPE: "critical"
         }
         return severity_map.get(violation_type, "medium")
@@ -0,0 +1,140 @@
+import os
+import sys
+import hmac
+import asyncio
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack from a background thread.
+
+    Every interval the sampler reads the target thread's current frame via
+    sys._current_frames() and counts the stack; the result is the collapsed
+    "root;...;leaf count" format consumed by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running"""
+
+_busy = asyncio.Lock()
+
+async def profile_event_loop(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the calling event loop's thread for a time-boxed window and
+    return collapsed stacks. Must be awaited on the loop being profiled.
+    """
+    if _busy.locked():
+        raise ProfilerBusy("A profile is already running")
+    async with _busy:
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+        logger.info(f"Profiled event loop for {seconds}s ({sum(profiler.samples.values())} samples)")
+        return profiler.collapsed()
+
+async def memory_diff(seconds: float, top: int = 25, frames: int = 10) -> str:
+    """Top allocation growth between two tracemalloc snapshots taken seconds apart"""
+    if _busy.locked():
+        raise ProfilerBusy("A profile is already running")
+    async with _busy:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+        # Hide the profiler's own bookkeeping
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        total = sum(stat.size_diff for stat in stats)
+        lines = [f"# tracemalloc diff over {seconds}s, net {total / 1024:+.1f} KiB"]
+        lines.extend(str(stat) for stat in stats[:top])
+        return "\n".join(lines) + "\n"
+
+def add_profiler_routes(app: web.Application, token: Optional[str], max_seconds: float):
+    """Expose /debug/profile and /debug/memory on the bot's HTTP server; disabled without a token"""
+    if not token:
+        logger.info("PROFILER_TOKEN not set, /debug profiling endpoints are disabled")
+        return
+
+    def parse(request: web.Request) -> float:
+        supplied = request.headers.get("X-Debug-Token", "")
+        if not hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+            raise web.HTTPForbidden(text="invalid debug token")
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+        except ValueError:
+            raise web.HTTPBadRequest(text="seconds must be a number")
+        return max(0.1, min(seconds, max_seconds))
+
+    async def cpu(request: web.Request) -> web.Response:
+        seconds = parse(request)
+        try:
+            interval = max(1.0, float(request.query.get("interval_ms", "5"))) / 1000.0
+        except ValueError:
+            raise web.HTTPBadRequest(text="interval_ms must be a number")
+        try:
+            body = await profile_event_loop(seconds, interval)
+        except ProfilerBusy as e:
+            raise web.HTTPConflict(text=str(e))
+        return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+    async def memory(request: web.Request) -> web.Response:
+        seconds = parse(request)
+        try:
+            top = int(request.query.get("top", "25"))
+        except ValueError:
+            raise web.HTTPBadRequest(text="top must be an integer")
+        try:
+            body = await memory_diff(seconds, top)
+        except ProfilerBusy as e:
+            raise web.HTTPConflict(text=str(e))
+        return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+    app.router.add_get("/debug/profile", cpu)
+    app.router.add_get("/debug/memory", memory)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Replay recorded or synthetic traffic through ModerationBot without a gateway.
+
+Messages are built as lightweight fake discord objects and fed to
+ModerationBot.on_message at a fixed rate; deletes, timeouts and DMs go to a
+fake REST layer with injectable latency and 429 responses. The full stack
+(flood detection, queues, cascade, enforcement, violation database) runs
+as in production and the report breaks end-to-end latency down by stage.
+
+Usage:
+    python replay.py --rate 200 --duration 30
+    python replay.py --input traffic.jsonl --rate 500 --rest-latency-ms 80 --rate-limit-ratio 0.02
+    python replay.py --rate 100 --ai-latency-ms 300
+
+Recorded JSONL lines: {"content", "author_id", "author_name", "channel_id", "guild_id"}
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+import discord
+from config import Config
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
+ROLE_MENTION_PATTERN = re.compile(r"<@&(\d+)>")
+
+class FakeREST:
+    """Stand-in for Discord REST calls with latency, jitter and 429s"""
+
+    def __init__(self, latency_ms: float = 50.0, jitter: float = 0.5, rate_limit_ratio: float = 0.0,
+                 retry_after: float = 1.0, seed: int = 1):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.rate_limited: Dict[str, int] = {}
+
+    async def call(self, endpoint: str):
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        delay = self.latency * (1 + self.jitter * (self.rng.random() * 2 - 1))
+        await asyncio.sleep(max(0.0, delay))
+        if self.rng.random() < self.rate_limit_ratio:
+            self.rate_limited[endpoint] = self.rate_limited.get(endpoint, 0) + 1
+            response = SimpleNamespace(
+                status=429, reason="Too Many Requests", headers={"Retry-After": str(self.retry_after)}
+            )
+            raise discord.HTTPException(response, {"message": "You are being rate limited.", "code": 0})
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+
+class FakeMember:
+    bot = False
+
+    def __init__(self, member_id: int, name: str, rest: FakeREST):
+        self.id = member_id
+        self.name = name
+        self.guild_permissions = SimpleNamespace(administrator=False)
+        self._rest = rest
+
+    def __str__(self) -> str:
+        return self.name
+
+    async def timeout(self, duration, reason: Optional[str] = None):
+        await self._rest.call("timeout")
+
+    async def send(self, *args, **kwargs):
+        await self._rest.call("dm")
+
+class FakeMessage:
+    def __init__(self, message_id: int, content: str, author: FakeMember, channel: FakeChannel,
+                 guild: FakeGuild, rest: FakeREST):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.raw_mentions = [int(m) for m in MENTION_PATTERN.findall(content)]
+        self.raw_role_mentions = [int(m) for m in ROLE_MENTION_PATTERN.findall(content)]
+        self.mention_everyone = "@everyone" in content
+        self.dispatched_at = 0.0
+        self._rest = rest
+
+    async def delete(self):
+        await self._rest.call("delete")
+
+class TrafficFactory:
+    """Builds fake messages, reusing guild, channel and member objects"""
+
+    def __init__(self, rest: FakeREST):
+        self.rest = rest
+        self._guilds: Dict[int, FakeGuild] = {}
+        self._channels: Dict[int, FakeChannel] = {}
+        self._members: Dict[tuple, FakeMember] = {}
+        self._next_id = 1
+
+    def build(self, content: str, author_id: int, author_name: str, channel_id: int, guild_id: int) -> FakeMessage:
+        guild = self._guilds.setdefault(guild_id, FakeGuild(guild_id))
+        channel = self._channels.setdefault(channel_id, FakeChannel(channel_id))
+        member = self._members.get((guild_id, author_id))
+        if member is None:
+            member = self._members[(guild_id, author_id)] = FakeMember(author_id, author_name, self.rest)
+        self._next_id += 1
+        return FakeMessage(self._next_id, content, member, channel, guild, self.rest)
+
+def recorded_traffic(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream recorded messages from a JSONL file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def synthetic_traffic(count: int, guilds: int = 20, users: int = 5000, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """Synthetic chat traffic; a few guilds carry most of the load"""
+    from benchmark import generate_corpus
+
+    rng = random.Random(seed)
+    corpus = generate_corpus(min(count, 20000), seed)
+    guild_weights = [1 / (rank + 1) for rank in range(guilds)]
+    for index in range(count):
+        guild_id = rng.choices(range(1, guilds + 1), guild_weights)[0]
+        user_id = rng.randrange(users)
+        yield {
+            "content": corpus[index % len(corpus)],
+            "author_id": user_id,
+            "author_name": f"user{user_id}",
+            "channel_id": guild_id * 100 + rng.randrange(5),
+            "guild_id": guild_id,
+        }
+
+def build_bot(rest: FakeREST):
+    """ModerationBot wired to timing hooks, without a gateway connection"""
+    from main import ModerationBot
+
+    class ReplayBot(ModerationBot):
+        def __init__(self):
+            super().__init__()
+            self.replay_latencies: List[float] = []
+
+        async def process_message(self, message, degraded: bool = False):
+            await super().process_message(message, degraded)
+            self.replay_latencies.append(time.perf_counter() - message.dispatched_at)
+
+    return ReplayBot()
+
+async def run_replay(traffic: Iterator[Dict[str, Any]], rate: float, duration: float, rest: FakeREST,
+                     ai_latency_ms: Optional[float]) -> Dict[str, Any]:
+    fake_server = None
+    if ai_latency_ms is not None:
+        from benchmark import start_fake_server
+        fake_server, base_url = await start_fake_server(ai_latency_ms)
+        Config.OPENAI_API_KEY = "replay"
+        Config.OPENAI_BASE_URL = base_url
+    else:
+        Config.OPENAI_API_KEY = None
+
+    bot = build_bot(rest)
+    # Never mirror synthetic violations into the real dashboard database
+    bot.violation_log_writer = None
+    await bot.start_offline()
+
+    factory = TrafficFactory(rest)
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    deadline = started + duration
+    sent = 0
+    for record in traffic:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        # Pace against the schedule rather than sleeping a fixed interval
+        target = started + sent * interval
+        if target > now:
+            await asyncio.sleep(target - now)
+        message = factory.build(
+            record["content"], int(record["author_id"]), record.get("author_name") or str(record["author_id"]),
+            int(record["channel_id"]), int(record["guild_id"])
+        )
+        message.dispatched_at = time.perf_counter()
+        await bot.on_message(message)
+        sent += 1
+    send_seconds = time.perf_counter() - started
+
+    # Drain the queues, in-flight workers and background enforcement before reporting
+    await bot.work_queue.join()
+    await bot.enforcement.close(timeout=60)
+    total_seconds = time.perf_counter() - started
+    latencies = sorted(bot.replay_latencies)
+
+    report = {
+        "sent": sent,
+        "processed": len(bot.replay_latencies),
+        "send_rate": sent / send_seconds if send_seconds else 0.0,
+        "throughput": len(bot.replay_latencies) / total_seconds if total_seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queue": bot.work_queue.get_stats(),
+        "stages": dict(bot.moderation_service.stage_counts),
+        "flood": bot.flood_detector.get_stats()["detections"],
+        "enforcement": dict(bot.enforcement.stats),
+        "rest_calls": dict(rest.calls),
+        "rest_rate_limited": dict(rest.rate_limited),
+    }
+
+    await bot.close()
+    if fake_server:
+        await fake_server.cleanup()
+    return report
+
+def time_breakdown() -> List[Dict[str, Any]]:
+    """Where time went, from the metrics histograms"""
+    from metrics import REGISTRY
+
+    rows = []
+    snapshot = REGISTRY.snapshot()
+    for name in ("moderation_queue_wait_seconds", "moderation_check_seconds", "moderation_ai_request_seconds",
+                 "moderation_enforcement_seconds", "moderation_database_seconds"):
+        series = snapshot.get(name, {}).get("series", [])
+        # Per-guild series are merged by weighting with their counts
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in series:
+            key = ",".join(f"{k}={v}" for k, v in entry["labels"].items() if k != "guild")
+            grouped.setdefault(key, []).append(entry)
+        for key, entries in sorted(grouped.items()):
+            count = sum(e["count"] for e in entries)
+            if not count:
+                continue
+            rows.append({
+                "component": name.replace("moderation_", "").replace("_seconds", ""),
+                "labels": key,
+                "count": count,
+                "mean_ms": sum(e["sum"] for e in entries) / count * 1000,
+                "p99_ms": max(e["p99"] for e in entries) * 1000,
+            })
+    return rows
+
+def print_report(report: Dict[str, Any], breakdown: List[Dict[str, Any]]):
+    print(f"Sent {report['sent']} messages at {report['send_rate']:.0f} msg/s, "
+          f"processed {report['processed']} ({report['throughput']:.0f} msg/s end to end)")
+    print(f"End-to-end latency: p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+    queue = report["queue"]
+    print(f"Queue: {queue['degraded']} degraded, {queue['shed']} shed")
+    print(f"Stages: {report['stages']}")
+    print(f"Flood detections: {report['flood']}")
+    print(f"Enforcement: {report['enforcement']}")
+    print(f"REST calls: {report['rest_calls']}, 429s: {report['rest_rate_limited']}")
+    print()
+    print(f"{'component':<16}{'labels':<36}{'count':>8}{'mean ms':>10}{'p99 ms':>10}")
+    for row in breakdown:
+        print(f"{row['component']:<16}{row['labels'][:35]:<36}{row['count']:>8}{row['mean_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay traffic through ModerationBot")
+    parser.add_argument("--input", help="Recorded JSONL traffic (default: synthetic)")
+    parser.add_argument("--rate", type=float, default=100.0, help="Messages per second (10-1000)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic to send")
+    parser.add_argument("--workers", type=int, default=Config.MODERATION_WORKERS, help="Moderation worker pool size")
+    parser.add_argument("--guilds", type=int, default=20, help="Synthetic guild count")
+    parser.add_argument("--users", type=int, default=5000, help="Synthetic user count")
+    parser.add_argument("--rest-latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of REST calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of fake 429s (seconds)")
+    parser.add_argument("--ai-latency-ms", type=float, help="Enable the AI stage against the fake OpenAI server")
+    parser.add_argument("--engine", choices=["jsonl", "sqlite"], default="jsonl", help="Violation database engine")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep replayed violations out of the real stores
+        Config.DATABASE_ENGINE = args.engine
+        Config.DATABASE_FILE = os.path.join(tmp, "violations.json")
+        Config.VIOLATION_LOG_DIR = os.path.join(tmp, "violation_log")
+        Config.SQLITE_DATABASE_FILE = os.path.join(tmp, "violations.db")
+        Config.MODERATION_WORKERS = args.workers
+        Config.METRICS_PORT = 0
+        Config.DASHBOARD_URL = None
+
+        rest = FakeREST(args.rest_latency_ms, rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after)
+        if args.input:
+            traffic = recorded_traffic(args.input)
+        else:
+            traffic = synthetic_traffic(int(args.rate * args.duration) + 1, args.guilds, args.users)
+
+        report = asyncio.run(run_replay(traffic, args.rate, args.duration, rest, args.ai_latency_ms))
+        breakdown = time_breakdown()
+
+    if args.json:
+        print(json.dumps({"report": report, "breakdown": breakdown}, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, breakdown)
+
+if __name__ == "__main__":
+    main()
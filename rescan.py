@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Retroactive rescan of stored messages when the keyword rules change.
+
+When the dashboard keyword set changes, the rescanner streams recent
+messages through both the previous and the new rule set and writes every
+message whose hits differ to a JSONL report. Sources are the bot's
+in-memory window of recent messages and the dashboard violation_logs
+table, read by id in fixed-size pages. Progress is checkpointed after each
+chunk so a restarted bot resumes where it stopped, and chunks are paused
+while the live moderation queues are busy. Rule sets are written once per
+change, next to the checkpoint, never with it.
+
+Usage:
+    python rescan.py status
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from config import Config
+from keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+class RecentMessageWindow:
+    """Bounded window of recent messages retained for rescans"""
+
+    def __init__(self, max_size: int):
+        self._messages = deque(maxlen=max_size)
+
+    def add(self, message):
+        self._messages.append({
+            "id": message.id,
+            "guild_id": message.guild.id,
+            "channel_id": message.channel.id,
+            "user_id": message.author.id,
+            "content": message.content,
+        })
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return list(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+def diff_hits(old_matcher: KeywordMatcher, new_matcher: KeywordMatcher, content: str) -> Dict[str, List[str]]:
+    """Keywords the new rules match that the old ones did not, and the reverse"""
+    lowered = content.lower()
+    old_hits = {f"{m.category}:{m.keyword}" for m in old_matcher.scan_lowered(lowered)}
+    new_hits = {f"{m.category}:{m.keyword}" for m in new_matcher.scan_lowered(lowered)}
+    return {"added": sorted(new_hits - old_hits), "removed": sorted(old_hits - new_hits)}
+
+class KeywordRescanner:
+    """
+    Runs one rescan job at a time in the background.
+
+    rules.json holds the last rule set seen and rules_<job>.json the old
+    and new rule sets of a job, both written once when the rules change.
+    The checkpoint file only holds the current job's progress: the last
+    violation_logs id processed and running counts. A new rule change
+    replaces an unfinished job.
+    """
+
+    def __init__(self, state_dir: str, database_url: Optional[str] = None,
+                 window: Optional[RecentMessageWindow] = None, chunk_size: int = 500,
+                 throttle_seconds: float = 0.1, lookback_days: int = 30,
+                 is_busy: Callable[[], bool] = lambda: False):
+        self.state_dir = state_dir
+        self.checkpoint_path = os.path.join(state_dir, "checkpoint.json")
+        self.rules_path = os.path.join(state_dir, "rules.json")
+        self.database_url = database_url
+        self.window = window
+        self.chunk_size = chunk_size
+        self.throttle_seconds = throttle_seconds
+        self.lookback_days = lookback_days
+        self.is_busy = is_busy
+        self.engine = None
+        self.state = load_checkpoint(self.checkpoint_path)
+        self._rules: Optional[Dict[str, Any]] = None
+        self._save_lock = threading.Lock()
+        self._save_seq = self._written_seq = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, window: Optional[RecentMessageWindow], is_busy: Callable[[], bool],
+                    scan_database: bool = True) -> "KeywordRescanner":
+        # Workers share violation_logs, so only one of them should scan it
+        state_dir = Config.RESCAN_STATE_DIR
+        if Config.CLUSTER_ID is not None:
+            state_dir = os.path.join(state_dir, f"bot-{Config.CLUSTER_ID}")
+        return cls(
+            state_dir,
+            database_url=Config.DATABASE_URL if scan_database else None,
+            window=window,
+            chunk_size=Config.RESCAN_CHUNK_SIZE,
+            throttle_seconds=Config.RESCAN_THROTTLE_SECONDS,
+            lookback_days=Config.RESCAN_LOOKBACK_DAYS,
+            is_busy=is_busy
+        )
+
+    @property
+    def job(self) -> Optional[Dict[str, Any]]:
+        return self.state.get("job")
+
+    async def rules_changed(self, matcher: KeywordMatcher) -> bool:
+        """Record the live rule set; start a rescan if it differs from the last one seen"""
+        loop = asyncio.get_running_loop()
+        rules, job = await loop.run_in_executor(None, self._prepare_job, matcher)
+        if rules is None:
+            return False
+        if job is not None:
+            # Swapped in on the loop, where the running job's counters are updated
+            self.state["job"] = job
+            await self._save()
+        # Written after the job so a crash in between recreates the job instead of losing it
+        await loop.run_in_executor(None, save_checkpoint, self.rules_path, rules)
+        self._rules = rules
+        if job is None:
+            # First rule set ever seen: nothing to compare against
+            return False
+        self.start()
+        return True
+
+    def _prepare_job(self, matcher: KeywordMatcher):
+        """
+        Export and compare a rule set in a worker thread. Returns (rules, job):
+        rules is None when nothing changed, job is None for the first rule set.
+        """
+        rules = matcher.export_keywords()
+        previous = self._rules
+        if previous is None:
+            previous = load_checkpoint(self.rules_path) or None
+        if previous == rules:
+            return None, None
+        if previous is None:
+            return rules, None
+
+        job_id = time.strftime("%Y%m%d-%H%M%S")
+        rules_path = os.path.join(self.state_dir, f"rules_{job_id}.json")
+        save_checkpoint(rules_path, {"old_rules": previous, "new_rules": rules})
+        return rules, {
+            "id": job_id,
+            "rules": rules_path,
+            "since": (datetime.utcnow() - timedelta(days=self.lookback_days)).isoformat(),
+            "last_id": 0,
+            "window_done": self.window is None,
+            "finished": False,
+            "started_at": time.time(),
+            "scanned": 0,
+            "changed": 0,
+            "added": {},
+            "removed": {},
+            "report": os.path.join(self.state_dir, f"rescan_{job_id}.jsonl"),
+        }
+
+    def resume(self):
+        """Continue an unfinished job after a restart"""
+        job = self.job
+        if job and not job["finished"]:
+            # The window lived in the previous process's memory
+            job["window_done"] = True
+            logger.info(f"Resuming keyword rescan {job['id']} after id {job['last_id']}")
+            self.start()
+
+    def start(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = asyncio.get_running_loop().create_task(self._run(self.job))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.engine is not None:
+            self.engine.dispose()
+
+    async def _run(self, job: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        try:
+            old_matcher, new_matcher = await loop.run_in_executor(None, load_matchers, job["rules"])
+            if not job["window_done"]:
+                rows = self.window.snapshot()
+                for start in range(0, len(rows), self.chunk_size):
+                    await self._process_chunk(job, "window", rows[start:start + self.chunk_size], old_matcher, new_matcher)
+                job["window_done"] = True
+                await self._save()
+
+            if self.database_url:
+                while True:
+                    rows = await loop.run_in_executor(None, self._fetch_page, job["last_id"], job["since"])
+                    if not rows:
+                        break
+                    await self._process_chunk(job, "violation_logs", rows, old_matcher, new_matcher)
+                    job["last_id"] = rows[-1]["id"]
+                    await self._save()
+
+            job["finished"] = True
+            job["finished_at"] = time.time()
+            await self._save()
+            logger.info(f"Keyword rescan {job['id']} done: {job['scanned']} messages, {job['changed']} with "
+                        f"different hits, report {job['report']}")
+        except asyncio.CancelledError:
+            await self._save()
+            raise
+        except Exception as e:
+            logger.error(f"Keyword rescan {job['id']} failed: {e}")
+
+    async def _process_chunk(self, job: Dict[str, Any], source: str, rows: List[Dict[str, Any]],
+                             old_matcher: KeywordMatcher, new_matcher: KeywordMatcher):
+        # Live moderation always goes first
+        while self.is_busy():
+            await asyncio.sleep(max(self.throttle_seconds, 0.5))
+
+        changes = []
+        for row in rows:
+            diff = diff_hits(old_matcher, new_matcher, row.get("content") or "")
+            if diff["added"] or diff["removed"]:
+                changes.append(dict(row, source=source, **diff))
+                for keyword in diff["added"]:
+                    job["added"][keyword] = job["added"].get(keyword, 0) + 1
+                for keyword in diff["removed"]:
+                    job["removed"][keyword] = job["removed"].get(keyword, 0) + 1
+        job["scanned"] += len(rows)
+        job["changed"] += len(changes)
+
+        if changes:
+            await asyncio.get_running_loop().run_in_executor(None, append_report, job["report"], changes)
+        await asyncio.sleep(self.throttle_seconds)
+
+    def _fetch_page(self, after_id: int, since: str) -> List[Dict[str, Any]]:
+        """One page of violation_logs by id (keyset pagination)"""
+        from sqlalchemy import create_engine, select
+        from violation_log_writer import violation_logs
+
+        if self.engine is None:
+            self.engine = create_engine(self.database_url, pool_pre_ping=True)
+        query = (
+            select(violation_logs.c.id, violation_logs.c.guild_id, violation_logs.c.channel_id,
+                   violation_logs.c.user_id, violation_logs.c.message_content)
+            .where(violation_logs.c.id > after_id, violation_logs.c.timestamp >= datetime.fromisoformat(since))
+            .order_by(violation_logs.c.id)
+            .limit(self.chunk_size)
+        )
+        with self.engine.connect() as conn:
+            return [
+                {"id": row.id, "guild_id": row.guild_id, "channel_id": row.channel_id,
+                 "user_id": row.user_id, "content": row.message_content}
+                for row in conn.execute(query)
+            ]
+
+    async def _save(self):
+        """Serialize the (small) checkpoint on the loop, where the state is mutated; write it in a worker thread"""
+        self._save_seq += 1
+        data = json.dumps(self.state, ensure_ascii=False)
+        await asyncio.get_running_loop().run_in_executor(None, self._write_checkpoint, self._save_seq, data)
+
+    def _write_checkpoint(self, seq: int, data: str):
+        with self._save_lock:
+            # Concurrent saves may reach the pool out of order; never overwrite a newer snapshot
+            if seq < self._written_seq:
+                return
+            write_atomic(self.checkpoint_path, data)
+            self._written_seq = seq
+
+    def get_stats(self) -> Dict[str, Any]:
+        job = self.job
+        if not job:
+            return {"running": False}
+        return {
+            "running": bool(self._task and not self._task.done()),
+            **{key: job[key] for key in ("id", "finished", "scanned", "changed", "last_id", "report")},
+        }
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable rescan checkpoint {path}: {e}")
+        return {}
+
+def load_matchers(rules_path: str):
+    """Old and new matchers of a job, built from its rules file"""
+    with open(rules_path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    return KeywordMatcher(rules["old_rules"]), KeywordMatcher(rules["new_rules"])
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    write_atomic(path, json.dumps(state, ensure_ascii=False))
+
+def write_atomic(path: str, data: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def append_report(path: str, changes: Iterable[Dict[str, Any]]):
+    with open(path, "a", encoding="utf-8") as f:
+        for change in changes:
+            f.write(json.dumps(change, ensure_ascii=False, default=str) + "\n")
+
+def print_status(state_dir: str):
+    """Summarize every checkpoint under the state directory"""
+    paths = []
+    for root, _, files in os.walk(state_dir):
+        if "checkpoint.json" in files:
+            paths.append(os.path.join(root, "checkpoint.json"))
+    if not paths:
+        print(f"No rescan checkpoints in {state_dir}")
+        return
+    for path in sorted(paths):
+        job = load_checkpoint(path).get("job")
+        if not job:
+            print(f"{path}: no rescan yet")
+            continue
+        state = "finished" if job["finished"] else f"in progress (after id {job['last_id']})"
+        print(f"{path}: rescan {job['id']} {state}, {job['scanned']} scanned, {job['changed']} changed")
+        for keyword, count in sorted(job["added"].items(), key=lambda item: -item[1])[:20]:
+            print(f"  + {keyword:<40} {count}")
+        for keyword, count in sorted(job["removed"].items(), key=lambda item: -item[1])[:20]:
+            print(f"  - {keyword:<40} {count}")
+        print(f"  report: {job['report']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect keyword rescan jobs")
+    parser.add_argument("command", choices=["status"])
+    parser.add_argument("--state-dir", default=Config.RESCAN_STATE_DIR)
+    args = parser.parse_args()
+    print_status(args.state_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Retention, archival and compaction of violation history.
+
+Violations older than their guild's retention period are copied into
+monthly gzip JSONL archives and then deleted from the live stores (the
+bot's violation database and the dashboard's violation_logs table), a
+small batch at a time. Afterwards the stores are compacted step by step,
+so the bot never pauses for a full rewrite. Archives stay queryable
+offline with `python retention.py query`.
+
+The bot runs the maintenance itself when RETENTION_DAYS is set. The JSONL
+store's segments belong to the running bot, so a manual run against them
+needs --offline and a stopped bot.
+
+Usage:
+    python retention.py run [--offline]
+    python retention.py query --source violations --guild 123 --since 2025-01
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def parse_days_by_guild(raw: str) -> Dict[int, int]:
+    """Parse "guild_id:days,guild_id:days"; 0 days keeps a guild's history forever"""
+    days_by_guild = {}
+    for item in (raw or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            guild_id, days = item.split(":")
+            days_by_guild[int(guild_id)] = int(days)
+        except ValueError:
+            logger.warning(f"Ignoring invalid RETENTION_DAYS_BY_GUILD entry: {item!r}")
+    return days_by_guild
+
+class RetentionPolicy:
+    """Expiry cutoffs at one point in time: a default plus per-guild overrides"""
+
+    def __init__(self, default_days: int, days_by_guild: Optional[Dict[int, int]] = None,
+                 now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
+        self.default_cutoff = now - timedelta(days=default_days) if default_days > 0 else None
+        self.overrides = {
+            guild_id: now - timedelta(days=days) if days > 0 else None
+            for guild_id, days in (days_by_guild or {}).items()
+        }
+        cutoffs = [cutoff for cutoff in (self.default_cutoff, *self.overrides.values()) if cutoff is not None]
+        # Anything newer than this is kept by every guild
+        self.latest_cutoff = max(cutoffs) if cutoffs else datetime.min
+
+    @classmethod
+    def from_config(cls, now: Optional[datetime] = None) -> "RetentionPolicy":
+        return cls(Config.RETENTION_DAYS, parse_days_by_guild(Config.RETENTION_DAYS_BY_GUILD), now)
+
+    def cutoff(self, guild_id) -> Optional[datetime]:
+        if guild_id in self.overrides:
+            return self.overrides[guild_id]
+        return self.default_cutoff
+
+    def __bool__(self) -> bool:
+        return self.latest_cutoff != datetime.min
+
+class ViolationArchive:
+    """Monthly gzip JSONL segments: <root>/<source>/<YYYY-MM>.jsonl.gz"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, source: str, month: str) -> str:
+        return os.path.join(self.root, source, f"{month}.jsonl.gz")
+
+    def write(self, source: str, records: List[Dict[str, Any]]) -> int:
+        """Append records to their month's segment and fsync before returning"""
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_month.setdefault(str(record["timestamp"])[:7], []).append(record)
+
+        for month, month_records in by_month.items():
+            path = self.path(source, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Each write adds a gzip member; readers see one concatenated stream
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    for record in month_records:
+                        f.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+        return len(records)
+
+    def months(self, source: str) -> List[str]:
+        directory = os.path.join(self.root, source)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:7] for name in os.listdir(directory) if name.endswith(".jsonl.gz"))
+
+    def iter_records(self, source: str, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream archived records of the months in [since, until] (YYYY-MM)"""
+        for month in self.months(source):
+            if (since and month < since) or (until and month > until):
+                continue
+            # A crash between archiving and deleting can archive a batch twice
+            seen = set()
+            with gzip.open(self.path(source, month), "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record.get("id") in seen:
+                        continue
+                    seen.add(record.get("id"))
+                    yield record
+
+class ViolationLogStore:
+    """The dashboard's violation_logs table, with the violation databases' maintenance API"""
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+        self.engine = None
+
+    def _connect(self):
+        from sqlalchemy import create_engine
+
+        if self.engine is None:
+            self.engine = create_engine(self.database_url, pool_pre_ping=True)
+        return self.engine.connect()
+
+    def collect_expired(self, policy: RetentionPolicy, limit: int) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+        from violation_log_writer import violation_logs
+
+        table = violation_logs
+        queries = []
+        for guild_id, cutoff in policy.overrides.items():
+            if cutoff is not None:
+                queries.append(select(table).where(table.c.guild_id == str(guild_id), table.c.timestamp < cutoff))
+        if policy.default_cutoff is not None:
+            query = select(table).where(table.c.timestamp < policy.default_cutoff)
+            if policy.overrides:
+                query = query.where(table.c.guild_id.notin_([str(guild_id) for guild_id in policy.overrides]))
+            queries.append(query)
+
+        expired = []
+        with self._connect() as conn:
+            for query in queries:
+                if len(expired) >= limit:
+                    break
+                rows = conn.execute(query.order_by(table.c.timestamp).limit(limit - len(expired)))
+                for row in rows:
+                    record = dict(row._mapping)
+                    record["timestamp"] = record["timestamp"].isoformat()
+                    expired.append(record)
+        return expired
+
+    def delete_violations(self, violations: List[Dict[str, Any]]) -> int:
+        from violation_log_writer import violation_logs
+
+        if not violations:
+            return 0
+        with self._connect() as conn:
+            result = conn.execute(violation_logs.delete().where(violation_logs.c.id.in_([v["id"] for v in violations])))
+            conn.commit()
+        return result.rowcount
+
+    def compact_step(self) -> bool:
+        # PostgreSQL autovacuum reclaims the space
+        return False
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.dispose()
+
+class RetentionManager:
+    """
+    Archives and deletes expired violations from each store in small
+    batches, then compacts the store one step at a time. Every batch runs
+    in a worker thread with a pause in between, and waits while is_busy()
+    reports that live moderation is backed up.
+    """
+
+    def __init__(self, stores: Dict[str, Any], archive: ViolationArchive, batch_size: int = 500,
+                 pause_seconds: float = 0.2, is_busy: Callable[[], bool] = lambda: False):
+        self.stores = stores
+        self.archive = archive
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.is_busy = is_busy
+        self.last_run: Dict[str, Any] = {}
+
+    @classmethod
+    def from_config(cls, violation_db, include_dashboard: bool = True,
+                    is_busy: Callable[[], bool] = lambda: False) -> "RetentionManager":
+        stores = {"violations": violation_db}
+        if include_dashboard and Config.DATABASE_URL:
+            stores["violation_logs"] = ViolationLogStore(Config.DATABASE_URL)
+        return cls(
+            stores,
+            ViolationArchive(Config.ARCHIVE_DIR),
+            batch_size=Config.RETENTION_BATCH_SIZE,
+            pause_seconds=Config.RETENTION_PAUSE_SECONDS,
+            is_busy=is_busy
+        )
+
+    def archive_batch(self, source: str, store, policy: RetentionPolicy) -> int:
+        """Archive one batch of expired records, then delete them; returns the batch size"""
+        records = store.collect_expired(policy, self.batch_size)
+        if records:
+            # Archive first: a crash in between duplicates a batch instead of losing it
+            self.archive.write(source, records)
+            store.delete_violations(records)
+        return len(records)
+
+    async def _pause(self):
+        await asyncio.sleep(self.pause_seconds)
+        while self.is_busy():
+            await asyncio.sleep(max(self.pause_seconds, 1.0))
+
+    async def run_once(self, policy: Optional[RetentionPolicy] = None) -> Dict[str, Any]:
+        """One full maintenance pass over every store"""
+        policy = policy or RetentionPolicy.from_config()
+        loop = asyncio.get_running_loop()
+        summary = {}
+        started = time.time()
+        for source, store in self.stores.items():
+            archived = compaction_steps = 0
+            try:
+                if policy:
+                    while True:
+                        count = await loop.run_in_executor(None, self.archive_batch, source, store, policy)
+                        archived += count
+                        if count < self.batch_size:
+                            break
+                        await self._pause()
+                while await loop.run_in_executor(None, store.compact_step):
+                    compaction_steps += 1
+                    await self._pause()
+            except Exception as e:
+                logger.error(f"Retention for {source} failed after archiving {archived} records: {e}")
+            summary[source] = {"archived": archived, "compaction_steps": compaction_steps}
+            if archived or compaction_steps:
+                logger.info(f"Retention for {source}: archived {archived} records, {compaction_steps} compaction steps")
+        self.last_run = {"started_at": started, "finished_at": time.time(), "stores": summary}
+        return summary
+
+    def close(self):
+        for store in self.stores.values():
+            if isinstance(store, ViolationLogStore):
+                store.close()
+
+def query_archive(args):
+    archive = ViolationArchive(args.archive_dir)
+    for record in archive.iter_records(args.source, args.since, args.until):
+        if args.guild is not None and str(record.get("guild_id")) != args.guild:
+            continue
+        if args.user is not None and str(record.get("user_id")) != args.user:
+            continue
+        if args.type is not None and record.get("violation_type") != args.type:
+            continue
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Violation history retention and archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Archive expired violations and compact the stores once")
+    run_parser.add_argument("--no-dashboard", action="store_true", help="Skip the dashboard violation_logs table")
+    run_parser.add_argument("--offline", action="store_true",
+                            help="Confirm the bot is stopped (required for the jsonl engine)")
+
+    query_parser = subparsers.add_parser("query", help="Print archived records as JSONL")
+    query_parser.add_argument("--source", choices=["violations", "violation_logs"], default="violations")
+    query_parser.add_argument("--archive-dir", default=Config.ARCHIVE_DIR)
+    query_parser.add_argument("--since", help="First month, YYYY-MM")
+    query_parser.add_argument("--until", help="Last month, YYYY-MM")
+    query_parser.add_argument("--guild")
+    query_parser.add_argument("--user")
+    query_parser.add_argument("--type", help="Violation type")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=Config.LOG_FORMAT)
+
+    if args.command == "query":
+        query_archive(args)
+        return
+
+    if Config.DATABASE_ENGINE.lower() != "sqlite" and not args.offline:
+        # A second ViolationDatabase would rewrite the live bot's segments under it
+        parser.error("the jsonl violation store belongs to the running bot, which applies retention itself; "
+                     "stop the bot and pass --offline to run it here")
+
+    from database import create_violation_database
+
+    database = create_violation_database()
+    manager = RetentionManager.from_config(database, include_dashboard=not args.no_dashboard)
+    try:
+        print(json.dumps(asyncio.run(manager.run_once()), indent=2))
+    finally:
+        manager.close()
+        if hasattr(database, "close"):
+            database.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-from flask import render_template, request, flash, redirect, url_for, jsonify
+from flask import render_template, request, flash, redirect, url_for, jsonify, Response
 from app import app, db
 from models import FilterKeyword, ViolationLog, BotSettings
 from forms import AddKeywordForm, EditKeywordForm, BotSettingsForm
+from bot_settings import RuntimeSettings, SETTINGS_VERSION_KEY
+from utils import safe_int_convert
 from datetime import datetime, timedelta
+from sqlalchemy import func
+from config import Config
+import urllib.request
+import hmac
 import json
 
 @app.route('/')
@@ -10,34 +16,38 @@ def dashboard():
     """Dashboard chính với thống kê tổng quan"""
     # Thống kê vi phạm 7 ngày qua
     week_ago = datetime.utcnow() - timedelta(days=7)
-    violations_week = ViolationLog.query.filter(ViolationLog.timestamp >= week_ago).all()
+    in_window = ViolationLog.timestamp >= week_ago
+    violation_count = func.count(ViolationLog.id).label('count')
     
     # Thống kê từ khóa
     total_keywords = FilterKeyword.query.filter_by(is_active=True).count()
     
     # Thống kê theo loại vi phạm
-    violation_stats = {}
-    for violation in violations_week:
-        vtype = violation.violation_type
-        if vtype not in violation_stats:
-            violation_stats[vtype] = 0
-        violation_stats[vtype] += 1
+    violation_stats = dict(
+        db.session.query(ViolationLog.violation_type, violation_count)
+        .filter(in_window)
+        .group_by(ViolationLog.violation_type)
+        .order_by(violation_count.desc())
+        .all()
+    )
+    total_violations = sum(violation_stats.values())
     
     # Top vi phạm
-    user_violations = {}
-    for violation in violations_week:
-        user_id = violation.user_id
-        if user_id not in user_violations:
-            user_violations[user_id] = {
-                'username': violation.username,
-                'count': 0
-            }
-        user_violations[user_id]['count'] += 1
-    
-    top_violators = sorted(user_violations.items(), key=lambda x: x[1]['count'], reverse=True)[:5]
+    top_rows = (
+        db.session.query(ViolationLog.user_id, func.max(ViolationLog.username), violation_count)
+        .filter(in_window)
+        .group_by(ViolationLog.user_id)
+        .order_by(violation_count.desc())
+        .limit(5)
+        .all()
+    )
+    top_violators = [
+        (user_id, {'username': username, 'count': count})
+        for user_id, username, count in top_rows
+    ]
     
     return render_template('dashboard.html',
-                         total_violations=len(violations_week),
+                         total_violations=total_violations,
                          total_keywords=total_keywords,
                          violation_stats=violation_stats,
                          top_violators=top_violators)
@@ -160,8 +170,16 @@ def violations():
     violations = query.order_by(ViolationLog.timestamp.desc()).paginate(
         page=page, per_page=50, error_out=False)
     
-    violation_types = db.session.query(ViolationLog.violation_type).distinct().all()
+    # Loại vi phạm trong khoảng thời gian đang xem (dùng index violation_type, timestamp)
+    violation_types = (
+        db.session.query(ViolationLog.violation_type)
+        .filter(ViolationLog.timestamp >= cutoff_date)
+        .group_by(ViolationLog.violation_type)
+        .all()
+    )
     violation_types = [vt[0] for vt in violation_types]
+    if violation_type and violation_type not in violation_types:
+        violation_types.append(violation_type)
     
     return render_template('violations.html',
                          violations=violations,
@@ -169,65 +187,160 @@ def violations():
                          current_type=violation_type,
                          current_days=days)
 
+def fetch_bot_metrics():
+    """Đọc snapshot metrics từ endpoint /metrics/summary của bot"""
+    url = f"{Config.BOT_METRICS_URL.rstrip('/')}/metrics/summary"
+    with urllib.request.urlopen(url, timeout=3) as response:
+        return json.load(response)
+
+def summarize_guild_metrics(snapshot):
+    """Gom độ trễ, tỉ lệ stage và hàng đợi theo từng guild"""
+    def series(name):
+        return snapshot.get(name, {}).get('series', [])
+    
+    guilds = {}
+    for entry in series('moderation_message_seconds'):
+        guilds[entry['labels']['guild']] = {
+            'guild': entry['labels']['guild'],
+            'messages': entry['count'],
+            'p50_ms': entry['p50'] * 1000,
+            'p95_ms': entry['p95'] * 1000,
+            'p99_ms': entry['p99'] * 1000,
+            'wait_p99_ms': 0.0,
+            'queue_depth': 0,
+            'stages': {},
+        }
+    for entry in series('moderation_stage_total'):
+        guild = guilds.get(entry['labels']['guild'])
+        if guild:
+            guild['stages'][entry['labels']['stage']] = entry['value']
+    for entry in series('moderation_queue_wait_seconds'):
+        guild = guilds.get(entry['labels']['guild'])
+        if guild:
+            guild['wait_p99_ms'] = entry['p99'] * 1000
+    for entry in series('moderation_queue_depth'):
+        guild = guilds.get(entry['labels']['guild'])
+        if guild:
+            guild['queue_depth'] = entry['value']
+    
+    for guild in guilds.values():
+        total = sum(guild['stages'].values()) or 1
+        guild['stage_rates'] = {stage: count * 100.0 / total for stage, count in sorted(guild['stages'].items())}
+    return sorted(guilds.values(), key=lambda g: g['p99_ms'], reverse=True)
+
+@app.route('/metrics')
+def bot_metrics():
+    """Bảng độ trễ và tỉ lệ stage của bot theo thời gian thực"""
+    try:
+        snapshot = fetch_bot_metrics()
+    except (OSError, ValueError) as e:
+        flash(f'Không thể kết nối tới metrics của bot ({Config.BOT_METRICS_URL}): {e}', 'warning')
+        snapshot = {}
+    
+    components = []
+    for name in ('moderation_check_seconds', 'moderation_ai_request_seconds',
+                 'moderation_enforcement_seconds', 'moderation_database_seconds'):
+        for entry in snapshot.get(name, {}).get('series', []):
+            components.append({
+                'name': name.replace('moderation_', '').replace('_seconds', ''),
+                'labels': ', '.join(f'{k}={v}' for k, v in entry['labels'].items()),
+                'count': entry['count'],
+                'p50_ms': entry['p50'] * 1000,
+                'p95_ms': entry['p95'] * 1000,
+                'p99_ms': entry['p99'] * 1000,
+            })
+    
+    return render_template('metrics.html',
+                         guilds=summarize_guild_metrics(snapshot),
+                         components=components,
+                         metrics_url=Config.BOT_METRICS_URL)
+
+@app.route('/debug/<any(profile, memory):kind>', methods=['POST'])
+def debug_profile(kind):
+    """Proxy profile CPU/bộ nhớ từ bot bằng token do người dùng nhập, trả về file để tải xuống"""
+    token = request.form.get('token') or request.headers.get('X-Debug-Token', '')
+    if not Config.PROFILER_TOKEN:
+        flash('Chưa cấu hình PROFILER_TOKEN, không thể profile bot từ dashboard', 'danger')
+        return redirect(url_for('bot_metrics'))
+    if not hmac.compare_digest(token.encode('utf-8'), Config.PROFILER_TOKEN.encode('utf-8')):
+        flash('Token profile không đúng', 'danger')
+        return redirect(url_for('bot_metrics'))
+
+    seconds = request.form.get('seconds', 10, type=float)
+    seconds = max(0.1, min(seconds, Config.PROFILER_MAX_SECONDS))
+    url = f"{Config.BOT_METRICS_URL.rstrip('/')}/debug/{kind}?seconds={seconds}"
+    headers = {'X-Debug-Token': token}
+    try:
+        req = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(req, timeout=seconds + 30) as response:
+            body = response.read()
+    except (OSError, ValueError) as e:
+        flash(f'Không thể lấy profile từ bot: {e}', 'danger')
+        return redirect(url_for('bot_metrics'))
+    
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}." + ('collapsed' if kind == 'profile' else 'txt')
+    return Response(body, mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Bộ nhớ đệm cài đặt, chỉ tải lại khi settings_version thay đổi
+_settings_cache = {'version': None, 'values': {}}
+
+def load_bot_settings():
+    """Tải toàn bộ cài đặt bằng một truy vấn"""
+    return {setting.setting_key: setting for setting in BotSettings.query.all()}
+
+def get_settings_version() -> int:
+    """Đọc bộ đếm phiên bản cài đặt"""
+    version = BotSettings.query.filter_by(setting_key=SETTINGS_VERSION_KEY).first()
+    return safe_int_convert(version.setting_value if version else None, 0)
+
+def get_cached_settings():
+    """Trả về (version, values), chỉ truy vấn toàn bộ bảng khi phiên bản đổi"""
+    version = get_settings_version()
+    if _settings_cache['version'] != version:
+        _settings_cache['values'] = {
+            key: setting.setting_value for key, setting in load_bot_settings().items()
+        }
+        _settings_cache['version'] = version
+    return version, _settings_cache['values']
+
+def set_setting(current_settings, key, value, description):
+    """Cập nhật hoặc tạo một cài đặt"""
+    setting = current_settings.get(key)
+    if setting:
+        setting.setting_value = value
+    else:
+        setting = BotSettings(setting_key=key, setting_value=value, description=description)
+        db.session.add(setting)
+        current_settings[key] = setting
+
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     """Trang cài đặt bot"""
     form = BotSettingsForm()
     
     # Load current settings
-    mute_duration = BotSettings.query.filter_by(setting_key='mute_duration').first()
-    invite_mute_duration = BotSettings.query.filter_by(setting_key='invite_mute_duration').first()
-    ai_moderation = BotSettings.query.filter_by(setting_key='ai_moderation').first()
+    current_settings = load_bot_settings()
+    runtime_settings = RuntimeSettings.from_raw({
+        key: setting.setting_value for key, setting in current_settings.items()
+    })
     
     if request.method == 'GET':
-        if mute_duration:
-            form.mute_duration.data = mute_duration.setting_value
-        else:
-            form.mute_duration.data = '10'
-            
-        if invite_mute_duration:
-            form.invite_mute_duration.data = invite_mute_duration.setting_value
-        else:
-            form.invite_mute_duration.data = '5'
-            
-        if ai_moderation:
-            form.ai_moderation.data = ai_moderation.setting_value == 'true'
-        else:
-            form.ai_moderation.data = True
+        form.mute_duration.data = str(runtime_settings.mute_duration)
+        form.invite_mute_duration.data = str(runtime_settings.invite_mute_duration)
+        form.ai_moderation.data = runtime_settings.ai_moderation
     
     if form.validate_on_submit():
-        # Update mute duration
-        if mute_duration:
-            mute_duration.setting_value = form.mute_duration.data
-        else:
-            mute_duration = BotSettings(
-                setting_key='mute_duration',
-                setting_value=form.mute_duration.data,
-                description='Thời gian mute cho vi phạm thường (phút)'
-            )
-            db.session.add(mute_duration)
+        set_setting(current_settings, 'mute_duration', form.mute_duration.data,
+                    'Thời gian mute cho vi phạm thường (phút)')
+        set_setting(current_settings, 'invite_mute_duration', form.invite_mute_duration.data,
+                    'Thời gian mute cho link Discord (phút)')
+        set_setting(current_settings, 'ai_moderation', 'true' if form.ai_moderation.data else 'false',
+                    'Sử dụng AI để kiểm duyệt')
         
-        # Update invite mute duration
-        if invite_mute_duration:
-            invite_mute_duration.setting_value = form.invite_mute_duration.data
-        else:
-            invite_mute_duration = BotSettings(
-                setting_key='invite_mute_duration',
-                setting_value=form.invite_mute_duration.data,
-                description='Thời gian mute cho link Discord (phút)'
-            )
-            db.session.add(invite_mute_duration)
-        
-        # Update AI moderation
-        if ai_moderation:
-            ai_moderation.setting_value = 'true' if form.ai_moderation.data else 'false'
-        else:
-            ai_moderation = BotSettings(
-                setting_key='ai_moderation',
-                setting_value='true' if form.ai_moderation.data else 'false',
-                description='Sử dụng AI để kiểm duyệt'
-            )
-            db.session.add(ai_moderation)
+        # Bump the version so the bot and cached readers pick up the change
+        set_setting(current_settings, SETTINGS_VERSION_KEY, str(runtime_settings.version + 1),
+                    'Phiên bản cài đặt (tự động tăng khi lưu)')
         
         db.session.commit()
         flash('Đã lưu cài đặt thành công!', 'success')
@@ -255,15 +368,17 @@ def api_keywords():
                 'context': keyword.context
             })
     
-    return jsonify(result)
+    # ETag lets the bot skip unchanged keyword sets with a 304
+    response = jsonify(result)
+    response.add_etag()
+    return response.make_conditional(request)
 
 @app.route('/api/settings')
 def api_settings():
     """API để bot lấy cài đặt"""
-    settings = BotSettings.query.all()
-    
-    result = {}
-    for setting in settings:
-        result[setting.setting_key] = setting.setting_value
+    version, values = get_cached_settings()
     
-    return jsonify(result)
\ No newline at end of file
+    # The version doubles as ETag so the bot's polls are usually a 304
+    response = jsonify(values)
+    response.set_etag(f"settings-{version}")
+    return response.make_conditional(request)
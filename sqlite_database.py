@@ -0,0 +1,374 @@
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterator, Iterable
+from config import Config
+from database import summarize_rollups
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        violation_type TEXT NOT NULL,
+        message_content TEXT NOT NULL,
+        channel_id INTEGER,
+        guild_id INTEGER,
+        timestamp TEXT NOT NULL,
+        handled INTEGER NOT NULL DEFAULT 1
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_violations_guild_time ON violations (guild_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_user_guild_time ON violations (user_id, guild_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_time ON violations (timestamp)",
+    """CREATE TABLE IF NOT EXISTS violation_rollups (
+        guild_id INTEGER,
+        day TEXT NOT NULL,
+        violation_type TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, day, violation_type, user_id)
+    )""",
+]
+
+# Statements are kept as constants so sqlite3's statement cache reuses them
+INSERT_VIOLATION = """INSERT INTO violations
+    (user_id, username, violation_type, message_content, channel_id, guild_id, timestamp, handled)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_VIOLATION_WITH_ID = """INSERT OR IGNORE INTO violations
+    (id, user_id, username, violation_type, message_content, channel_id, guild_id, timestamp, handled)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SELECT_SINCE = "SELECT * FROM violations WHERE timestamp >= ? ORDER BY timestamp"
+SELECT_GUILD_SINCE = "SELECT * FROM violations WHERE guild_id = ? AND timestamp >= ? ORDER BY timestamp"
+SELECT_USER_SINCE = "SELECT * FROM violations WHERE user_id = ? AND timestamp >= ? ORDER BY timestamp"
+SELECT_USER_GUILD_SINCE = """SELECT * FROM violations
+    WHERE user_id = ? AND guild_id = ? AND timestamp >= ? ORDER BY timestamp"""
+SELECT_PAGE = "SELECT * FROM violations WHERE id > ? ORDER BY id LIMIT ?"
+UPSERT_ROLLUP = """INSERT INTO violation_rollups (guild_id, day, violation_type, user_id, username, count)
+    VALUES (?, ?, ?, ?, ?, 1)
+    ON CONFLICT (guild_id, day, violation_type, user_id)
+    DO UPDATE SET count = count + 1, username = excluded.username"""
+REBUILD_ROLLUPS = """INSERT INTO violation_rollups (guild_id, day, violation_type, user_id, username, count)
+    SELECT guild_id, substr(timestamp, 1, 10), violation_type, user_id, MAX(username), COUNT(*)
+    FROM violations WHERE timestamp >= ? AND timestamp < ?
+    GROUP BY guild_id, substr(timestamp, 1, 10), violation_type, user_id"""
+# Whole days after the cutoff come from the rollups, the partial cutoff day from raw rows
+STATS_FROM_ROLLUPS = """SELECT day, violation_type, user_id, username, count FROM violation_rollups
+    WHERE guild_id = ? AND day > ?"""
+SELECT_GUILD_EXPIRED = "SELECT * FROM violations WHERE guild_id = ? AND timestamp < ? ORDER BY timestamp LIMIT ?"
+DELETE_VIOLATION = "DELETE FROM violations WHERE id = ?"
+DECREMENT_ROLLUP = """UPDATE violation_rollups SET count = count - ?
+    WHERE guild_id IS ? AND day = ? AND violation_type = ? AND user_id = ?"""
+STATS_BOUNDARY_DAY = """SELECT substr(timestamp, 1, 10), violation_type, user_id, MAX(username), COUNT(*)
+    FROM violations WHERE guild_id = ? AND timestamp >= ? AND timestamp < ?
+    GROUP BY violation_type, user_id"""
+
+class SQLiteViolationDatabase:
+    """
+    SQLite (WAL) storage engine with the same API as ViolationDatabase.
+
+    Range and per-user lookups are index seeks on (guild_id, timestamp) and
+    (user_id, guild_id, timestamp); statistics are summed from a rollup
+    table kept per guild/day/type/user and updated with every insert.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.config = Config()
+        self.db_path = db_path or self.config.SQLITE_DATABASE_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, cached_statements=64)
+        self._conn.row_factory = sqlite3.Row
+        self._ensure_database_exists()
+
+    def _ensure_database_exists(self):
+        """Enable WAL and create the schema if needed"""
+        with self._lock, self._conn:
+            # Only takes effect for new files; lets compact_step() free pages gradually
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            # Databases created before the rollup table existed
+            has_rollups = self._conn.execute("SELECT 1 FROM violation_rollups LIMIT 1").fetchone()
+            has_violations = self._conn.execute("SELECT 1 FROM violations LIMIT 1").fetchone()
+            if has_violations and not has_rollups:
+                self._conn.execute(REBUILD_ROLLUPS, ("", "~"))
+        logger.info(f"Using SQLite violation database: {self.db_path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        violation = dict(row)
+        violation["handled"] = bool(violation["handled"])
+        return violation
+
+    def iter_violations(self, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield every violation in insertion order, one keyset page at a time"""
+        last_id = 0
+        while True:
+            rows = self._query(SELECT_PAGE, (last_id, page_size))
+            if not rows:
+                return
+            for row in rows:
+                yield self._to_dict(row)
+            last_id = rows[-1]["id"]
+
+    def add_violation(self, user_id: int, username: str, violation_type: str,
+                     message_content: str, channel_id: int, guild_id: int):
+        """Add a new violation to the database"""
+        try:
+            timestamp = datetime.utcnow().isoformat()
+            with self._lock, self._conn:
+                self._conn.execute(INSERT_VIOLATION, (
+                    user_id, username, violation_type, message_content[:500],
+                    channel_id, guild_id, timestamp, 1
+                ))
+                self._conn.execute(UPSERT_ROLLUP, (guild_id, timestamp[:10], violation_type, user_id, username))
+
+            logger.info(f"Added violation for user {username} ({user_id}): {violation_type}")
+
+        except Exception as e:
+            logger.error(f"Failed to add violation: {e}")
+
+    def get_violations_last_week(self, guild_id: int = None) -> List[Dict[str, Any]]:
+        """Get all violations from the last week for a specific guild"""
+        try:
+            one_week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+            if guild_id is None:
+                rows = self._query(SELECT_SINCE, (one_week_ago,))
+            else:
+                rows = self._query(SELECT_GUILD_SINCE, (guild_id, one_week_ago))
+            return [self._to_dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Failed to get violations: {e}")
+            return []
+
+    def get_user_violations(self, user_id: int, guild_id: int = None, days: int = 30) -> List[Dict[str, Any]]:
+        """Get violations for a specific user"""
+        try:
+            cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            if guild_id is None:
+                rows = self._query(SELECT_USER_SINCE, (user_id, cutoff_date))
+            else:
+                rows = self._query(SELECT_USER_GUILD_SINCE, (user_id, guild_id, cutoff_date))
+            return [self._to_dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Failed to get user violations: {e}")
+            return []
+
+    def get_violation_stats(self, guild_id: int, days: int = 7) -> Dict[str, Any]:
+        """Get violation statistics for a guild"""
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            boundary_day = cutoff.date()
+            next_day = (boundary_day + timedelta(days=1)).isoformat()
+
+            rows = [tuple(row) for row in self._query(STATS_FROM_ROLLUPS, (guild_id, boundary_day.isoformat()))]
+            rows += [tuple(row) for row in self._query(STATS_BOUNDARY_DAY, (guild_id, cutoff.isoformat(), next_day))]
+            return summarize_rollups(rows, days)
+
+        except Exception as e:
+            logger.error(f"Failed to get violation stats: {e}")
+            return {"total_violations": 0, "violation_types": {}, "top_violators": {}, "daily_breakdown": {}, "average_per_day": 0}
+
+    def _get_violations_last_n_days(self, guild_id: int, days: int) -> List[Dict[str, Any]]:
+        """Get violations from the last N days"""
+        try:
+            cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            return [self._to_dict(row) for row in self._query(SELECT_GUILD_SINCE, (guild_id, cutoff_date))]
+
+        except Exception as e:
+            logger.error(f"Failed to get violations for last {days} days: {e}")
+            return []
+
+    def clear_violations(self, guild_id: int = None):
+        """Clear all violations for a guild or all violations"""
+        try:
+            with self._lock, self._conn:
+                if guild_id is None:
+                    self._conn.execute("DELETE FROM violations")
+                    self._conn.execute("DELETE FROM violation_rollups")
+                    logger.info("Cleared all violations")
+                else:
+                    cleared_count = self._conn.execute("DELETE FROM violations WHERE guild_id = ?", (guild_id,)).rowcount
+                    self._conn.execute("DELETE FROM violation_rollups WHERE guild_id = ?", (guild_id,))
+                    logger.info(f"Cleared {cleared_count} violations for guild {guild_id}")
+
+        except Exception as e:
+            logger.error(f"Failed to clear violations: {e}")
+
+    def cleanup_old_violations(self, days: int = 30):
+        """Remove violations older than specified days"""
+        try:
+            cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            with self._lock, self._conn:
+                removed_count = self._conn.execute("DELETE FROM violations WHERE timestamp < ?", (cutoff_date,)).rowcount
+                # Drop expired days and recount the partially expired one
+                self._conn.execute("DELETE FROM violation_rollups WHERE day <= ?", (cutoff_date[:10],))
+                next_day = (datetime.fromisoformat(cutoff_date).date() + timedelta(days=1)).isoformat()
+                self._conn.execute(REBUILD_ROLLUPS, (cutoff_date, next_day))
+
+            if removed_count > 0:
+                logger.info(f"Cleaned up {removed_count} old violations (older than {days} days)")
+
+        except Exception as e:
+            logger.error(f"Failed to cleanup old violations: {e}")
+
+    def collect_expired(self, policy, limit: int) -> List[Dict[str, Any]]:
+        """Up to limit violations past their guild's retention, oldest first per guild"""
+        expired = []
+        for guild_id, cutoff in policy.overrides.items():
+            if cutoff is not None and len(expired) < limit:
+                rows = self._query(SELECT_GUILD_EXPIRED, (guild_id, cutoff.isoformat(), limit - len(expired)))
+                expired.extend(self._to_dict(row) for row in rows)
+        if policy.default_cutoff is not None and len(expired) < limit:
+            # Guilds with their own retention were handled above
+            excluded = list(policy.overrides)
+            placeholders = ", ".join("?" * len(excluded))
+            guild_filter = f"AND (guild_id IS NULL OR guild_id NOT IN ({placeholders}))" if excluded else ""
+            rows = self._query(
+                f"SELECT * FROM violations WHERE timestamp < ? {guild_filter} ORDER BY timestamp LIMIT ?",
+                (policy.default_cutoff.isoformat(), *excluded, limit - len(expired))
+            )
+            expired.extend(self._to_dict(row) for row in rows)
+        return expired
+
+    def delete_violations(self, violations: List[Dict[str, Any]]) -> int:
+        """Delete specific violations (already archived) and their rollup counts"""
+        if not violations:
+            return 0
+        rollups = Counter(
+            (v["guild_id"], v["timestamp"][:10], v["violation_type"], v["user_id"]) for v in violations
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(DELETE_VIOLATION, [(v["id"],) for v in violations])
+            self._conn.executemany(DECREMENT_ROLLUP, [(count, *key) for key, count in rollups.items()])
+            self._conn.execute("DELETE FROM violation_rollups WHERE count <= 0")
+        return len(violations)
+
+    def compact_step(self, pages: int = 1000) -> bool:
+        """Return up to pages free pages to the filesystem; False when none are left"""
+        with self._lock:
+            if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Files created before incremental auto-vacuum reuse free pages instead
+                return False
+            self._conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            return self._conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    def import_violations(self, violations: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                          keep_ids: bool = True) -> int:
+        """
+        Insert existing violation records; returns rows actually inserted.
+        keep_ids=False lets SQLite assign fresh ids, for sources whose ids
+        are not unique.
+        """
+        imported = 0
+        batch = []
+        for violation in violations:
+            batch.append((
+                violation.get("id") if keep_ids else None, violation["user_id"], violation["username"], violation["violation_type"],
+                violation.get("message_content", "")[:500], violation.get("channel_id"), violation.get("guild_id"),
+                violation["timestamp"], 1 if violation.get("handled", True) else 0
+            ))
+            if len(batch) >= batch_size:
+                imported += self._insert_batch(batch)
+                batch = []
+        if batch:
+            imported += self._insert_batch(batch)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM violation_rollups")
+            self._conn.execute(REBUILD_ROLLUPS, ("", "~"))
+        return imported
+
+    def _insert_batch(self, batch: List[tuple]) -> int:
+        with self._lock, self._conn:
+            # Rows whose id already exists are ignored and not counted
+            return self._conn.executemany(INSERT_VIOLATION_WITH_ID, batch).rowcount
+
+def iter_legacy_violations(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Stream the objects of a {"violations": [...]} file without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        position = -1
+        eof = False
+
+        # Find the opening bracket of the violations array
+        while position < 0:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            position = buffer.find("[")
+        buffer = buffer[position + 1:]
+
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if buffer.startswith("]"):
+                return
+            try:
+                violation, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield violation
+            buffer = buffer[end:]
+
+def migrate_from_json(source: str, db_path: str = None) -> int:
+    """One-shot migration of a legacy violations.json into SQLite"""
+    database = SQLiteViolationDatabase(db_path)
+    try:
+        # Legacy ids repeat after clear_violations, so SQLite assigns new ones
+        count = database.import_violations(iter_legacy_violations(source), keep_ids=False)
+    finally:
+        database.close()
+    logger.info(f"Migrated {count} violations from {source} to {database.db_path}")
+    return count
+
+def migrate_from_violation_log(db_path: str = None) -> int:
+    """One-shot migration of the live records of the JSONL violation log"""
+    from database import ViolationDatabase
+
+    log = ViolationDatabase()
+    database = SQLiteViolationDatabase(db_path)
+    try:
+        count = database.import_violations(log.iter_violations())
+    finally:
+        database.close()
+    logger.info(f"Migrated {count} violations from {log.log_dir} to {database.db_path}")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate violation history into SQLite")
+    parser.add_argument("--source", choices=["json", "jsonl"], default="json",
+                        help="json: legacy violations.json, jsonl: the append-only violation log")
+    parser.add_argument("--json-file", default=Config.DATABASE_FILE)
+    parser.add_argument("--db", default=Config.SQLITE_DATABASE_FILE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=Config.LOG_FORMAT)
+    if args.source == "json":
+        migrate_from_json(args.json_file, args.db)
+    else:
+        migrate_from_violation_log(args.db)
@@ -3,31 +3,11 @@
 Launcher script để chạy cả Discord Bot và Web Dashboard cùng lúc
 """
 
-import subprocess
 import sys
-import time
 import os
-from threading import Thread
-
-def run_discord_bot():
-    """Chạy Discord Bot"""
-    print("🤖 Starting Discord Bot...")
-    try:
-        subprocess.run([sys.executable, "main.py"], check=True)
-    except KeyboardInterrupt:
-        print("🤖 Discord Bot stopped")
-    except Exception as e:
-        print(f"❌ Discord Bot error: {e}")
-
-def run_web_dashboard():
-    """Chạy Web Dashboard"""
-    print("🌐 Starting Web Dashboard...")
-    try:
-        subprocess.run([sys.executable, "web_app.py"], check=True)
-    except KeyboardInterrupt:
-        print("🌐 Web Dashboard stopped")
-    except Exception as e:
-        print(f"❌ Web Dashboard error: {e}")
+from config import Config
+from cluster import ClusterSupervisor, ManagedProcess, build_bot_workers, resolve_shard_count
+from utils import setup_logging
 
 def check_environment():
     """Kiểm tra environment variables cần thiết"""
@@ -77,31 +57,24 @@ def main():
     if not check_environment():
         sys.exit(1)
     
-    print("\nStarting both Discord Bot and Web Dashboard...")
-    print("Press Ctrl+C to stop both services\n")
+    setup_logging()
+    shard_count = resolve_shard_count(Config.SHARD_COUNT)
+    processes = build_bot_workers(shard_count, Config.CLUSTER_WORKERS)
+    processes.append(ManagedProcess("web", [sys.executable, "web_app.py"], {}))
     
-    # Tạo threads cho cả 2 services
-    bot_thread = Thread(target=run_discord_bot, daemon=True)
-    dashboard_thread = Thread(target=run_web_dashboard, daemon=True)
+    print(f"\n🤖 Discord Bot: {shard_count} shard(s) trên {len(processes) - 1} process")
+    print("🌐 Web Dashboard: http://localhost:5000")
+    print("📊 Trạng thái cluster: python cluster.py status")
+    print("\nPress Ctrl+C to stop all services...\n")
     
-    try:
-        # Start cả 2 services
-        bot_thread.start()
-        time.sleep(2)  # Delay nhỏ để bot start trước
-        dashboard_thread.start()
-        
-        print("✅ Both services started successfully!")
-        print("🤖 Discord Bot: Running")
-        print("🌐 Web Dashboard: http://localhost:5000")
-        print("\nPress Ctrl+C to stop all services...")
-        
-        # Keep main thread alive
-        while True:
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Stopping all services...")
-        print("👋 Goodbye!")
+    # Supervisor tự khởi động lại process bị crash
+    ClusterSupervisor(
+        processes,
+        max_restart_delay=Config.CLUSTER_MAX_RESTART_DELAY_SECONDS,
+        status_dir=Config.CLUSTER_STATUS_DIR,
+        status_interval=Config.CLUSTER_STATUS_INTERVAL_SECONDS
+    ).run()
+    print("👋 Goodbye!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,6 +2,7 @@ import logging
 import os
 from datetime import datetime
 from config import Config
+from message_scanner import scan_message
 
 def setup_logging():
     """Setup logging configuration"""
@@ -48,8 +49,7 @@ def truncate_message(message: str, max_length: int = 100) -> str:
 
 def is_mention(text: str) -> bool:
     """Check if text contains user mentions"""
-    import re
-    return bool(re.search(r'<@[!&]?\d+>', text))
+    return scan_message(text).mention_count > 0
 
 def extract_user_id_from_mention(mention: str) -> int:
     """Extract user ID from Discord mention"""
@@ -144,8 +144,13 @@ def safe_int_convert(value, default=0):
 def clean_content(content: str) -> str:
     """Clean message content for logging/storage"""
     # Remove mentions, channels, and roles for privacy
-    import re
-    cleaned = re.sub(r'<@[!&]?\d+>', '[USER]', content)
-    cleaned = re.sub(r'<#\d+>', '[CHANNEL]', cleaned)
-    cleaned = re.sub(r'<@&\d+>', '[ROLE]', cleaned)
-    return cleaned.strip()
+    placeholders = {"user": "[USER]", "role": "[ROLE]", "channel": "[CHANNEL]"}
+    parts = []
+    position = 0
+    for kind, start, end in scan_message(content).spans:
+        if kind in placeholders:
+            parts.append(content[position:start])
+            parts.append(placeholders[kind])
+            position = end
+    parts.append(content[position:])
+    return "".join(parts).strip()
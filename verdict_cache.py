@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+def normalize_content(content: str) -> str:
+    """Normalize a message so trivially different copies share a cache key"""
+    return " ".join(unicodedata.normalize("NFC", content).lower().split())
+
+@lru_cache(maxsize=8)
+def prompt_fingerprint(model: str, prompt: str) -> str:
+    """Fingerprint of the model and prompt that produced cached verdicts"""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+class VerdictCache:
+    """
+    Bounded LRU cache of AI verdicts keyed on a hash of the normalized message.
+    
+    Entries expire after a TTL, and the whole cache is dropped when the
+    model/prompt fingerprint changes so stale verdicts are never served.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.fingerprint: Optional[str] = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def make_key(content: str) -> str:
+        return hashlib.blake2b(normalize_content(content).encode("utf-8"), digest_size=16).hexdigest()
+    
+    def ensure_fingerprint(self, fingerprint: str):
+        """Invalidate every entry if the model or prompt has changed"""
+        if fingerprint == self.fingerprint:
+            return
+        if self._entries:
+            logger.info(f"AI prompt/model changed, dropping {len(self._entries)} cached verdicts")
+            self.invalidations += 1
+        self._entries.clear()
+        self.fingerprint = fingerprint
+    
+    def get(self, content: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached verdict, or None on miss/expiry"""
+        key = self.make_key(content)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, verdict = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(verdict)
+    
+    def put(self, content: str, verdict: Dict[str, Any]):
+        """Store a verdict, evicting the least recently used entries when full"""
+        if self.max_size <= 0:
+            return
+        key = self.make_key(content)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(verdict))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
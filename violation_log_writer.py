@@ -0,0 +1,155 @@
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Text, Float, DateTime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Mirrors models.ViolationLog without importing the Flask app
+metadata = MetaData()
+violation_logs = Table(
+    "violation_logs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String(50), nullable=False),
+    Column("username", String(100), nullable=False),
+    Column("guild_id", String(50), nullable=False),
+    Column("channel_id", String(50), nullable=False),
+    Column("violation_type", String(100), nullable=False),
+    Column("message_content", Text, nullable=False),
+    Column("detected_keywords", Text, nullable=True),
+    Column("ai_confidence", Float, nullable=True),
+    Column("action_taken", String(100), nullable=False),
+    Column("timestamp", DateTime, default=datetime.utcnow),
+)
+
+class ViolationLogWriter:
+    """
+    Write-behind queue from the bot into the dashboard's violation_logs table.
+
+    Records are queued in memory and flushed as one multi-row INSERT when
+    the batch is full or the flush interval expires. The database round
+    trip runs in a worker thread, so moderation never waits on it; when the
+    queue is full, submit() waits for room (backpressure) instead of
+    growing without bound.
+    """
+
+    def __init__(self, database_url: str, batch_size: int = 100, flush_interval: float = 2.0,
+                 max_queue_size: int = 10000, max_retries: int = 3):
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.engine = None
+        self._task: Optional[asyncio.Task] = None
+        self._backpressure = False
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["ViolationLogWriter"]:
+        """Create a writer if the dashboard database is configured"""
+        if not Config.DATABASE_URL:
+            logger.info("DATABASE_URL not set, violations will not be mirrored to the dashboard")
+            return None
+        return cls(
+            Config.DATABASE_URL,
+            batch_size=Config.VIOLATION_LOG_BATCH_SIZE,
+            flush_interval=Config.VIOLATION_LOG_FLUSH_SECONDS,
+            max_queue_size=Config.VIOLATION_LOG_QUEUE_SIZE
+        )
+
+    async def start(self):
+        """Connect and start the background flush task"""
+        if self._task is not None:
+            return
+        self.engine = create_engine(self.database_url, pool_pre_ping=True, pool_recycle=300)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Violation log writer started")
+
+    async def submit(self, record: Dict[str, Any]):
+        """Queue one violation_logs row; waits only when the queue is full"""
+        record.setdefault("timestamp", datetime.utcnow())
+        try:
+            self.queue.put_nowait(record)
+            self._backpressure = False
+        except asyncio.QueueFull:
+            if not self._backpressure:
+                logger.warning("Violation log queue full, waiting for the writer to catch up")
+                self._backpressure = True
+            await self.queue.put(record)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self.queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        """Insert a batch off the event loop, retrying transient failures"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await loop.run_in_executor(None, self._insert, batch)
+                self.rows_written += len(batch)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to write {len(batch)} violation logs (attempt {attempt}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        self.rows_dropped += len(batch)
+        logger.error(f"Dropped {len(batch)} violation logs after {self.max_retries} attempts")
+
+    def _insert(self, batch: List[Dict[str, Any]]):
+        with self.engine.begin() as conn:
+            conn.execute(violation_logs.insert(), batch)
+
+    async def close(self):
+        """Flush everything still queued, then stop the writer"""
+        if self._task is None:
+            return
+        # The sentinel is queued behind pending records, so they are written first
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+        self.engine.dispose()
+        logger.info(f"Violation log writer stopped ({self.rows_written} rows written, {self.rows_dropped} dropped)")
+
+def build_log_record(message, violation_type: str, action_taken: str,
+                     violation_result: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Build a violation_logs row from a Discord message and moderation verdict"""
+    violation_result = violation_result or {}
+    keywords = [match["keyword"] for match in violation_result.get("matched_keywords", [])]
+    return {
+        "user_id": str(message.author.id),
+        "username": str(message.author),
+        "guild_id": str(message.guild.id),
+        "channel_id": str(message.channel.id),
+        "violation_type": violation_type,
+        "message_content": message.content,
+        "detected_keywords": json.dumps(keywords, ensure_ascii=False) if keywords else None,
+        "ai_confidence": violation_result.get("confidence") if violation_result.get("stage") == "ai" else None,
+        "action_taken": action_taken,
+        "timestamp": datetime.utcnow(),
+    }